@@ -0,0 +1,279 @@
+"""Assigning inspectors to bridges at scale.
+
+assign_inspectors_indexed gives exactly the same assignments as
+assign_inspectors in bridge_functions.py, but looks for candidate bridges
+in spatial indexes that hold only the bridges whose current BCI qualifies
+for each priority level, so the work done for an inspector grows with the
+number of qualifying bridges near them rather than with the whole
+inventory.
+
+assign_inspectors_optimal instead chooses the assignment for all inspectors
+at once, maximizing the total priority of the bridges assigned, so that an
+inspector's capacity is not used up on low-priority bridges that another
+inspector could have taken.
+
+Both compute the distances from inspectors to bridges with the cached
+trigonometry of a distance service, if one is attached to the bridge data
+(see distance_service.build_distance_service).
+"""
+
+from collections import deque
+from heapq import heapreplace
+from typing import Optional
+
+from bridge_functions import calculate_distance
+from bridge_store import make_bridge_lookup
+from constants import (
+    ID_INDEX, LAT_INDEX, LON_INDEX, BCIS_INDEX,
+    HIGH_PRIORITY_BCI, MEDIUM_PRIORITY_BCI, LOW_PRIORITY_BCI,
+    HIGH_PRIORITY_RADIUS, MEDIUM_PRIORITY_RADIUS, LOW_PRIORITY_RADIUS)
+from distance_service import DistanceService
+from index_registry import find_index
+from spatial_index import SpatialIndex
+
+
+# The (radius, BCI limit) of each priority level, highest priority first.
+PRIORITY_LEVELS = [(HIGH_PRIORITY_RADIUS, HIGH_PRIORITY_BCI),
+                   (MEDIUM_PRIORITY_RADIUS, MEDIUM_PRIORITY_BCI),
+                   (LOW_PRIORITY_RADIUS, LOW_PRIORITY_BCI)]
+
+# In assign_inspectors_optimal, assigning a bridge at priority level i (0
+# for the highest) is worth len(PRIORITY_LEVELS) - i, less DISTANCE_PENALTY
+# times the distance as a fraction of the level's radius. The penalty is
+# below 1, so no distance makes a lower level worth more than a higher one.
+DISTANCE_PENALTY = 0.5
+AUCTION_EPSILON = 0.01
+
+
+class PriorityLevel:
+    """The bridges that qualify for one priority level: those whose current
+    BCI is at most the level's BCI limit, with a spatial index over them.
+    """
+
+    def __init__(self, bridge_data: list[list], radius: float,
+                 bci_limit: float, current_bcis: list) -> None:
+        """Initialize the level with radius radius and BCI limit bci_limit
+        for bridge data bridge_data, where current_bcis[i] is the current BCI
+        of bridge_data[i], or None if it has none.
+        """
+
+        self.radius = radius
+        self.positions = [pos for pos in range(len(bridge_data))
+                          if current_bcis[pos] is not None
+                          and current_bcis[pos] <= bci_limit]
+        self.index = SpatialIndex([bridge_data[pos]
+                                   for pos in self.positions])
+
+    def candidates(self, lat: float, lon: float) -> list[int]:
+        """Return the positions of the qualifying bridges that might be
+        within this level's radius of location (lat, lon), in increasing
+        order.
+        """
+
+        return [self.positions[sub] for sub in
+                self.index.candidates_in_radius(lat, lon, self.radius)]
+
+
+def get_current_bcis(bridge_data: list[list]) -> list:
+    """Return a list with the current BCI of each bridge in bridge_data, or
+    None for a bridge without BCIs. As in get_bridges_with_bci_below, the
+    BCI of a bridge is that of the first bridge with the same ID.
+
+    >>> get_current_bcis([[1, 'A', '1', 43.0, -80.0, '', '', '', 0, [], 0,
+    ...                    '', [55.5, 60.0]],
+    ...                   [2, 'B', '1', 43.0, -80.0, '', '', '', 0, [], 0,
+    ...                    '', []]])
+    [55.5, None]
+    """
+
+    lookup = make_bridge_lookup(bridge_data)
+    current_bcis = []
+    for bridge in bridge_data:
+        bcis = lookup(bridge[ID_INDEX])[BCIS_INDEX]
+        current_bcis.append(bcis[0] if bcis else None)
+    return current_bcis
+
+
+def _distance(bridge_data: list[list], service: DistanceService,
+              location: list[float], pos: int) -> float:
+    """Return the distance from location, a (latitude, longitude) pair, to
+    the bridge at position pos in bridge_data, as calculate_distance
+    computes it, using the distance service service unless it is None.
+    """
+
+    if service is not None:
+        return service.distance_to_position(location[0], location[1], pos)
+    bridge = bridge_data[pos]
+    return calculate_distance(location[0], location[1], bridge[LAT_INDEX],
+                              bridge[LON_INDEX])
+
+
+def assign_inspectors_indexed(bridge_data: list[list],
+                              inspectors: list[list[float]],
+                              max_bridges: int) -> list[list[int]]:
+    """Return the same assignment of bridges to inspectors as
+    assign_inspectors(bridge_data, inspectors, max_bridges).
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> assign_inspectors_indexed(THREE_BRIDGES, [[43.10, -80.15]], 2)
+    [[1, 2]]
+    >>> assign_inspectors_indexed(THREE_BRIDGES,
+    ...                           [[43.20, -80.35], [45.0368, -81.34]], 2)
+    [[1, 2], [3]]
+    >>> assign_inspectors_indexed(THREE_BRIDGES,
+    ...                           [[43.20, -80.35], [43.10, -80.15]], 1)
+    [[1], [2]]
+    """
+
+    current_bcis = get_current_bcis(bridge_data)
+    service = find_index(bridge_data, DistanceService)
+    levels = [PriorityLevel(bridge_data, radius, bci_limit, current_bcis)
+              for (radius, bci_limit) in PRIORITY_LEVELS]
+
+    assigned_ids = set()
+    assigned_bridges = []
+    for inspector in inspectors:
+        assigned_list = []
+        for level in levels:
+            if len(assigned_list) >= max_bridges:
+                break
+            for pos in level.candidates(inspector[0], inspector[1]):
+                bridge = bridge_data[pos]
+                if (bridge[ID_INDEX] not in assigned_ids
+                        and _distance(bridge_data, service, inspector,
+                                      pos) <= level.radius):
+                    assigned_list.append(bridge[ID_INDEX])
+                    assigned_ids.add(bridge[ID_INDEX])
+                    if len(assigned_list) >= max_bridges:
+                        break
+        assigned_bridges.append(assigned_list)
+    return assigned_bridges
+
+
+def _candidate_inspectors(index: SpatialIndex, bridge: list,
+                          levels: list[int],
+                          max_candidates: Optional[int]) -> list[int]:
+    """Return the positions of the inspectors in spatial index index that
+    may be within the radius of one of the priority levels levels of
+    bridge, or of only the max_candidates inspectors nearest to bridge if
+    max_candidates is not None.
+    """
+
+    if not levels:
+        return []
+    if max_candidates is not None:
+        return [inspector for (_, inspector)
+                in index.nearest(bridge[LAT_INDEX], bridge[LON_INDEX],
+                                 max_candidates)]
+    radius = max(PRIORITY_LEVELS[level][0] for level in levels)
+    return index.candidates_in_radius(bridge[LAT_INDEX], bridge[LON_INDEX],
+                                      radius)
+
+
+def get_assignment_values(bridge_data: list[list],
+                          inspectors: list[list[float]],
+                          max_candidates: Optional[int] = None
+                          ) -> list[dict[int, tuple[float, int]]]:
+    """Return a list with, for each bridge in bridge_data, a dictionary
+    from the position of each inspector in inspectors that may be assigned
+    the bridge to a pair (value, level): the value of that assignment and
+    the priority level it is made at: the highest level whose BCI limit and
+    radius the bridge is within. Every inspector within reach of a bridge
+    is considered, unless max_candidates is given: then only the
+    max_candidates inspectors nearest to each bridge are, which bounds the
+    work for very large inputs but can make the assignment worse.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> values = get_assignment_values(THREE_BRIDGES, [[43.10, -80.15]])
+    >>> [sorted(value) for value in values]
+    [[0], [0], []]
+    >>> round(values[0][0][0], 4), values[0][0][1]
+    (0.9368, 2)
+    """
+
+    index = SpatialIndex.from_locations(inspectors)
+    current_bcis = get_current_bcis(bridge_data)
+    service = find_index(bridge_data, DistanceService)
+    all_values = []
+    for pos in range(len(bridge_data)):
+        bridge = bridge_data[pos]
+        levels = [level for level in range(len(PRIORITY_LEVELS))
+                  if current_bcis[pos] is not None
+                  and current_bcis[pos] <= PRIORITY_LEVELS[level][1]]
+        values = {}
+        for inspector in _candidate_inspectors(index, bridge, levels,
+                                               max_candidates):
+            distance = _distance(bridge_data, service,
+                                 inspectors[inspector], pos)
+            for level in levels:
+                radius = PRIORITY_LEVELS[level][0]
+                if distance <= radius:
+                    values[inspector] = (len(PRIORITY_LEVELS) - level
+                                         - DISTANCE_PENALTY
+                                         * distance / radius, level)
+                    break
+        all_values.append(values)
+    return all_values
+
+
+def assign_inspectors_optimal(bridge_data: list[list],
+                              inspectors: list[list[float]],
+                              max_bridges: int,
+                              max_candidates: Optional[int] = None,
+                              epsilon: float = AUCTION_EPSILON
+                              ) -> list[list[int]]:
+    """Return a list of bridge IDs from bridge_data to be assigned to each
+    inspector in inspectors, with at most max_bridges per inspector and
+    each bridge assigned at most once, as in assign_inspectors. Rather than
+    letting inspectors choose in turn, the assignment maximizes the total
+    value of all assignments (see get_assignment_values), to within epsilon
+    per bridge. Each inspector's IDs are listed by priority level, then in
+    the order of bridge_data. max_candidates is passed on to
+    get_assignment_values.
+
+    The assignment is found with an auction: each unassigned bridge bids
+    for its best inspector, and an inspector with no free capacity gives up
+    its lowest bid.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> assign_inspectors_optimal(THREE_BRIDGES,
+    ...                           [[43.20, -80.35], [43.10, -80.15]], 1)
+    [[1], [2]]
+    >>> assign_inspectors_optimal(THREE_BRIDGES,
+    ...                           [[43.20, -80.35], [45.0368, -81.34]], 2)
+    [[1, 2], [3]]
+    >>> assign_inspectors_optimal(THREE_BRIDGES, [[43.10, -80.15]], 0)
+    [[]]
+    """
+
+    assigned_bridges = [[] for _ in inspectors]
+    if max_bridges <= 0 or not inspectors:
+        return assigned_bridges
+
+    values = get_assignment_values(bridge_data, inspectors, max_candidates)
+    # slots[i] is a min-heap of (price, bridge position or -1) pairs, one
+    # for each bridge inspector i can take.
+    slots = [[(0.0, -1)] * max_bridges for _ in inspectors]
+    unassigned = deque(pos for pos in range(len(bridge_data)) if values[pos])
+    while unassigned:
+        pos = unassigned.popleft()
+        best, best_profit, second_profit = -1, 0.0, 0.0
+        for inspector, (value, _) in values[pos].items():
+            profit = value - slots[inspector][0][0]
+            if profit > best_profit:
+                best, best_profit, second_profit = (inspector, profit,
+                                                    best_profit)
+            elif profit > second_profit:
+                second_profit = profit
+        if best != -1:
+            price = slots[best][0][0] + best_profit - second_profit + epsilon
+            outbid = heapreplace(slots[best], (price, pos))[1]
+            if outbid != -1:
+                unassigned.append(outbid)
+
+    for inspector in range(len(inspectors)):
+        taken = sorted((values[pos][inspector][1], pos)
+                       for (_, pos) in slots[inspector] if pos != -1)
+        assigned_bridges[inspector] = [bridge_data[pos][ID_INDEX]
+                                       for (_, pos) in taken]
+    return assigned_bridges
@@ -0,0 +1,470 @@
+"""Running statistics of BCI scores, kept up to date as scores are added.
+
+A BciStats keeps the number, sum, minimum, maximum, mean and variance of
+the BCI scores of one bridge, and adds a new score in constant time. A
+BciStatsIndex keeps one for every bridge in a BridgeStore: once
+build_bci_stats has attached it, get_average_bci and get_average_bcis use
+the running sums instead of adding up each bridge's history, and
+inspect_bridges and ingest_inspections keep them up to date. The BCIs of
+the bridges stay plain lists.
+
+Formatted bridge data lists the BCIs of a bridge newest first, so a new
+inspection is recorded with bcis.insert(0, bci), which shifts the whole
+history. A bridge whose history is long can opt in to a BciHistory with
+use_bci_history. A BciHistory stores the scores oldest first, so that the
+same insert(0, bci) is an append, while indexing, iterating, comparing and
+printing it still see the scores newest first, like the list it replaces.
+It keeps its own BciStats.
+"""
+
+from collections.abc import MutableSequence
+from math import inf
+from typing import Iterable, Iterator, Union
+
+from constants import BCIS_INDEX
+from index_registry import attach_index
+
+
+# The number of digits get_average_bci rounds averages to.
+AVERAGE_DIGITS = 4
+
+# A rounded average is recomputed exactly as get_average_bci computes it
+# when the unrounded running average is this close to halfway between two
+# possible results, since the running sum may differ from sum(bcis) in its
+# last bits.
+BOUNDARY_TOLERANCE = 1e-6
+
+
+class BciStats:
+    """The number, sum, minimum, maximum, mean and variance of the BCI
+    scores of one bridge.
+
+    >>> stats = BciStats([70.0, 69.5, 72.3])
+    >>> stats.add(71.9)
+    >>> stats.count, round(stats.total, 1), stats.minimum, stats.maximum
+    (4, 283.7, 69.5, 72.3)
+    >>> stats.average([71.9, 72.3, 69.5, 70.0])
+    70.925
+    >>> round(stats.variance(), 4)
+    1.4319
+    >>> stats.add('70.1')
+    Traceback (most recent call last):
+    TypeError: BCI scores must be numbers, not str
+    >>> stats.count
+    4
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', '_mean',
+                 '_squares')
+
+    def __init__(self, bcis: Iterable[float] = ()) -> None:
+        """Initialize the statistics of the scores in bcis, oldest first.
+        """
+
+        self.count = 0
+        self.total = 0.0
+        self.minimum = inf
+        self.maximum = -inf
+        self._mean = 0.0
+        self._squares = 0.0
+        for value in bcis:
+            self.add(value)
+
+    def add(self, value: float) -> None:
+        """Add the score value, as the newest score, in constant time. If
+        value is not a number, raise TypeError and leave these statistics
+        unchanged.
+        """
+
+        if not isinstance(value, (int, float)):
+            raise TypeError('BCI scores must be numbers, not '
+                            f'{type(value).__name__}')
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._squares += delta * (value - self._mean)
+
+    def average(self, bcis: Iterable[float]) -> float:
+        """Return the average of the scores rounded to AVERAGE_DIGITS digits,
+        exactly as get_average_bci computes it from the scores bcis, newest
+        first, or 0.0 if there are none. bcis is only read when the average
+        is too close to a rounding boundary to trust the running sum.
+        """
+
+        if not self.count:
+            return 0.0
+        scaled = self.total / self.count * 10 ** AVERAGE_DIGITS
+        if abs(scaled % 1 - 0.5) < BOUNDARY_TOLERANCE:
+            return round(sum(bcis) / self.count, AVERAGE_DIGITS)
+        return round(self.total / self.count, AVERAGE_DIGITS)
+
+    def mean(self) -> float:
+        """Return the unrounded mean of the scores, or 0.0 if there are none.
+        """
+
+        return self._mean
+
+    def variance(self) -> float:
+        """Return the population variance of the scores, or 0.0 if there
+        are none.
+        """
+
+        return self._squares / self.count if self.count else 0.0
+
+    def copy(self) -> 'BciStats':
+        """Return a copy of these statistics."""
+
+        stats = BciStats()
+        for name in self.__slots__:
+            setattr(stats, name, getattr(self, name))
+        return stats
+
+
+class BciHistory(MutableSequence):
+    """The BCI scores of one bridge, newest first.
+
+    >>> history = BciHistory([72.3, 69.5, 70.0])
+    >>> history.insert(0, 71.9)
+    >>> history
+    [71.9, 72.3, 69.5, 70.0]
+    >>> history[0], history[-1], len(history)
+    (71.9, 70.0, 4)
+    >>> history == [71.9, 72.3, 69.5, 70.0]
+    True
+    >>> history[1:3]
+    [72.3, 69.5]
+    >>> round(history.total, 1), history.minimum, history.maximum
+    (283.7, 69.5, 72.3)
+    >>> history.average()
+    70.925
+    >>> round(history.variance(), 4)
+    1.4319
+    """
+
+    def __init__(self, bcis: Iterable[float] = ()) -> None:
+        """Initialize a new history with the scores in bcis, newest first.
+        """
+
+        self._values = []
+        self.stats = BciStats()
+        for value in reversed(list(bcis)):
+            self.add_newest(value)
+
+    @property
+    def total(self) -> float:
+        """The sum of the scores."""
+
+        return self.stats.total
+
+    @property
+    def minimum(self) -> float:
+        """The lowest score, or inf if there are none."""
+
+        return self.stats.minimum
+
+    @property
+    def maximum(self) -> float:
+        """The highest score, or -inf if there are none."""
+
+        return self.stats.maximum
+
+    def _replace_values(self, values: list) -> None:
+        """Replace the scores with values, oldest first, and recompute the
+        running statistics. If a value is not a number, raise TypeError and
+        leave this history unchanged.
+        """
+
+        history = BciHistory()
+        for value in values:
+            history.add_newest(value)
+        self._values, self.stats = history._values, history.stats
+
+    def average(self) -> float:
+        """Return the average of the scores rounded to AVERAGE_DIGITS digits,
+        exactly as get_average_bci computes it, or 0.0 if there are none.
+        """
+
+        return self.stats.average(self)
+
+    def mean(self) -> float:
+        """Return the unrounded mean of the scores, or 0.0 if there are none.
+        """
+
+        return self.stats.mean()
+
+    def variance(self) -> float:
+        """Return the population variance of the scores, or 0.0 if there
+        are none.
+        """
+
+        return self.stats.variance()
+
+    def _position(self, i: int) -> int:
+        """Return the position in the stored, oldest-first values of the
+        score at newest-first index i, for 0 <= i < len(self).
+        """
+
+        return len(self._values) - 1 - i
+
+    def __len__(self) -> int:
+        """Return the number of scores in this history."""
+
+        return len(self._values)
+
+    def __getitem__(self, i):
+        """Return the score at index i, or a list of the scores in slice i,
+        counting from the newest score.
+        """
+
+        if isinstance(i, slice):
+            return self.newest_first()[i]
+        if i < 0:
+            i += len(self._values)
+        if not 0 <= i < len(self._values):
+            raise IndexError('BciHistory index out of range')
+        return self._values[self._position(i)]
+
+    def __setitem__(self, i, value) -> None:
+        """Replace the score at index i, or the scores in slice i, counting
+        from the newest score.
+        """
+
+        if isinstance(i, slice):
+            bcis = self.newest_first()
+            bcis[i] = value
+            self._replace_values(bcis[::-1])
+        else:
+            if i < 0:
+                i += len(self._values)
+            if not 0 <= i < len(self._values):
+                raise IndexError('BciHistory assignment index out of range')
+            values = self._values[:]
+            values[self._position(i)] = value
+            self._replace_values(values)
+
+    def __delitem__(self, i) -> None:
+        """Remove the score at index i, or the scores in slice i, counting
+        from the newest score.
+        """
+
+        bcis = self.newest_first()
+        del bcis[i]
+        self._replace_values(bcis[::-1])
+
+    def insert(self, index: int, value: float) -> None:
+        """Insert score value before index index, counting from the newest
+        score. Inserting a new newest score at index 0 takes constant time.
+        """
+
+        if index < 0:
+            index = max(index + len(self._values), 0)
+        if index == 0:
+            self.add_newest(value)
+        else:
+            index = min(index, len(self._values))
+            values = self._values[:]
+            values.insert(len(values) - index, value)
+            self._replace_values(values)
+
+    def add_newest(self, value: float) -> None:
+        """Record value as the newest score, updating the running statistics
+        in constant time. If value is not a number, raise TypeError and
+        leave this history unchanged.
+
+        >>> history = BciHistory([71.5])
+        >>> history.add_newest(None)
+        Traceback (most recent call last):
+        TypeError: BCI scores must be numbers, not NoneType
+        >>> history, history.total
+        ([71.5], 71.5)
+        """
+
+        self.stats.add(value)
+        self._values.append(value)
+
+    def __iter__(self) -> Iterator[float]:
+        """Return an iterator over the scores, newest first."""
+
+        return reversed(self._values)
+
+    def __reversed__(self) -> Iterator[float]:
+        """Return an iterator over the scores, oldest first."""
+
+        return iter(self._values)
+
+    def newest_first(self) -> list[float]:
+        """Return a list of the scores, newest first."""
+
+        return self._values[::-1]
+
+    def __eq__(self, other) -> bool:
+        """Return whether other is a BciHistory or a list with the same
+        scores, newest first.
+        """
+
+        if isinstance(other, BciHistory):
+            return self._values == other._values
+        if isinstance(other, list):
+            return self.newest_first() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """Return a representation of the scores as a list, newest first."""
+
+        return repr(self.newest_first())
+
+    def __deepcopy__(self, memo: dict) -> 'BciHistory':
+        """Return a copy of this history. Scores are immutable numbers, so
+        they are shared.
+        """
+
+        return self.copy()
+
+    def copy(self) -> 'BciHistory':
+        """Return a copy of this history."""
+
+        history = BciHistory()
+        history._values = self._values[:]
+        history.stats = self.stats.copy()
+        return history
+
+
+def use_bci_history(bridge: list) -> BciHistory:
+    """Replace the list of BCIs of the bridge record bridge with a
+    BciHistory of the same scores, unless it already is one, and return the
+    history.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> history = use_bci_history(THREE_BRIDGES[0][:])
+    >>> type(history).__name__, history[:2]
+    ('BciHistory', [72.3, 69.5])
+    """
+
+    if not isinstance(bridge[BCIS_INDEX], BciHistory):
+        bridge[BCIS_INDEX] = BciHistory(bridge[BCIS_INDEX])
+    return bridge[BCIS_INDEX]
+
+
+def add_bci(bridge: list, bci: float) -> None:
+    """Record bci as the newest BCI of the bridge record bridge, keeping the
+    sequence its BCIs are in: a list, a BciHistory or the array of a
+    compact Bridge.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> bridge = THREE_BRIDGES[0][:]
+    >>> bridge[BCIS_INDEX] = bridge[BCIS_INDEX][:]
+    >>> add_bci(bridge, 71.9)
+    >>> type(bridge[BCIS_INDEX]).__name__, bridge[BCIS_INDEX][:2]
+    ('list', [71.9, 72.3])
+    """
+
+    bridge[BCIS_INDEX].insert(0, bci)
+
+
+def average_bci(bcis: Union[list[float], BciHistory]) -> float:
+    """Return the average of the BCIs bcis rounded to AVERAGE_DIGITS
+    digits, or 0.0 if there are none. For a BciHistory the running sum is
+    used.
+
+    >>> average_bci([72.3, 69.5])
+    70.9
+    >>> average_bci(BciHistory([72.3, 69.5]))
+    70.9
+    >>> average_bci([])
+    0.0
+    """
+
+    if isinstance(bcis, BciHistory):
+        return bcis.average()
+    return round(sum(bcis) / len(bcis), AVERAGE_DIGITS) if bcis else 0.0
+
+
+class BciStatsIndex:
+    """The BciStats of the BCIs of each bridge in bridge data.
+
+    An index expects each change of a bridge's BCIs to be reported with
+    record_changed. If the BCIs grew by one score, that score is taken to
+    be the new newest one, as add_bci adds it, and is added in constant
+    time; after any other change the bridge's statistics are recomputed.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> bridges = [bridge[:BCIS_INDEX] + [bridge[BCIS_INDEX][:]]
+    ...            for bridge in THREE_BRIDGES]
+    >>> index = BciStatsIndex(bridges)
+    >>> index.average(bridges[2])
+    74.4
+    >>> add_bci(bridges[2], 80.1)
+    >>> index.record_changed(bridges[2])
+    >>> index.average(bridges[2]), index.stats(bridges[2]).maximum
+    (75.0333, 90.1)
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize the statistics of the bridges in bridge data
+        bridge_data.
+        """
+
+        self._stats = {}
+        for bridge in bridge_data:
+            self._count(bridge)
+
+    def _count(self, bridge: list) -> None:
+        """Compute the statistics of the BCIs of bridge from scratch."""
+
+        bcis = bridge[BCIS_INDEX]
+        self._stats[id(bridge)] = (bcis, BciStats(reversed(list(bcis))))
+
+    def record_changed(self, bridge: list) -> None:
+        """Update the statistics after bridge was modified in place."""
+
+        entry = self._stats.get(id(bridge))
+        if entry is None:
+            return
+        bcis, stats = entry
+        if bridge[BCIS_INDEX] is bcis and len(bcis) == stats.count + 1:
+            stats.add(bcis[0])
+        else:
+            self._count(bridge)
+
+    def stats(self, bridge: list) -> BciStats:
+        """Return the statistics of the BCIs of bridge, a bridge in the
+        bridge data, computing them if they are out of date.
+        """
+
+        entry = self._stats.get(id(bridge))
+        if (entry is None or bridge[BCIS_INDEX] is not entry[0]
+                or len(entry[0]) != entry[1].count):
+            self._count(bridge)
+            entry = self._stats[id(bridge)]
+        return entry[1]
+
+    def average(self, bridge: list) -> float:
+        """Return the average BCI of bridge as get_average_bci computes it.
+        """
+
+        return self.stats(bridge).average(bridge[BCIS_INDEX])
+
+
+def build_bci_stats(bridge_data: list[list]) -> BciStatsIndex:
+    """Build the BCI statistics of the bridges in the BridgeStore
+    bridge_data, attach them to bridge_data so that get_average_bci and
+    get_average_bcis use them and inspect_bridges and ingest_inspections
+    keep them up to date, and return them.
+
+    >>> from copy import deepcopy
+    >>> from bridge_functions import (
+    ...     THREE_BRIDGES, get_average_bci, inspect_bridges)
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore(deepcopy(THREE_BRIDGES))
+    >>> index = build_bci_stats(bridges)
+    >>> inspect_bridges(bridges, [3], '09/15/2018', 80.1)
+    >>> get_average_bci(bridges, 3), index.stats(bridges.get(3)).count
+    (75.0333, 9)
+    """
+
+    index = BciStatsIndex(bridge_data)
+    attach_index(bridge_data, index)
+    return index
@@ -0,0 +1,140 @@
+"""A sorted index on the current BCI of the bridges in formatted bridge
+data, for threshold, range and worst-N queries.
+
+The index keeps one (current BCI, position, ID) entry for each bridge that
+has BCIs, sorted, so every query is a binary search followed by a slice.
+As in get_bridges_with_bci_below, the current BCI of an ID is that of the
+first bridge with the ID. inspect_bridges keeps the index up to date
+through the index registry.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from math import inf
+from typing import Optional
+
+from constants import ID_INDEX, BCIS_INDEX
+from index_registry import attach_index
+
+
+class BciIndex:
+    """The bridges in bridge data with BCIs, sorted by current BCI, then by
+    position.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> index = BciIndex(THREE_BRIDGES)
+    >>> index.ids_at_most(72.3)
+    [2, 1]
+    >>> index.ids_between(72.0, 80.0)
+    [1]
+    >>> index.worst(1)
+    [2]
+    >>> index.current_bci(3)
+    85.1
+    >>> index.current_bci(4) is None
+    True
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize a new index over the current BCIs of the bridges in
+        bridge data bridge_data.
+        """
+
+        self.size = len(bridge_data)
+        self._entries = []
+        self._current = {}
+        self._tracked = {}
+        self.stale = False
+        for pos in range(self.size):
+            bridge = bridge_data[pos]
+            if bridge[ID_INDEX] not in self._current:
+                bcis = bridge[BCIS_INDEX]
+                bci = bcis[0] if bcis else None
+                self._current[bridge[ID_INDEX]] = bci
+                self._tracked[id(bridge)] = pos
+                if bci is not None:
+                    self._entries.append((bci, pos, bridge[ID_INDEX]))
+        self._entries.sort()
+
+    def record_changed(self, bridge: list) -> None:
+        """Move bridge to its place for its current BCI after it was
+        modified in place. A current BCI that is not a number cannot be
+        placed among the others, so the index is then marked stale instead.
+
+        >>> from copy import deepcopy
+        >>> from bridge_functions import THREE_BRIDGES
+        >>> bridges = deepcopy(THREE_BRIDGES)
+        >>> index = BciIndex(bridges)
+        >>> bridges[0][BCIS_INDEX].insert(0, '71.9')
+        >>> index.record_changed(bridges[0])
+        >>> index.stale, index.worst(3)
+        (True, [2, 1, 3])
+        """
+
+        pos = self._tracked.get(id(bridge))
+        if pos is None:
+            return
+        bridge_id = bridge[ID_INDEX]
+        old_bci = self._current[bridge_id]
+        bcis = bridge[BCIS_INDEX]
+        new_bci = bcis[0] if bcis else None
+        if old_bci == new_bci:
+            return
+        if new_bci is not None and not isinstance(new_bci, (int, float)):
+            self.stale = True
+            return
+        if old_bci is not None:
+            del self._entries[bisect_left(self._entries, (old_bci, pos))]
+        if new_bci is not None:
+            insort(self._entries, (new_bci, pos, bridge_id))
+        self._current[bridge_id] = new_bci
+
+    def current_bci(self, bridge_id: int) -> Optional[float]:
+        """Return the current BCI of the bridge with ID bridge_id, or None
+        if there is no such bridge or it has no BCIs.
+        """
+
+        return self._current.get(bridge_id)
+
+    def ids_between(self, low: float, high: float) -> list[int]:
+        """Return the IDs of the bridges whose current BCI is at least low
+        and at most high, from the lowest current BCI to the highest.
+        """
+
+        start = bisect_left(self._entries, (low,))
+        end = bisect_right(self._entries, (high, inf))
+        return [entry[2] for entry in self._entries[start:end]]
+
+    def ids_at_most(self, bci_limit: float) -> list[int]:
+        """Return the IDs of the bridges whose current BCI is at most
+        bci_limit, from the lowest current BCI to the highest.
+        """
+
+        end = bisect_right(self._entries, (bci_limit, inf))
+        return [entry[2] for entry in self._entries[:end]]
+
+    def worst(self, k: int) -> list[int]:
+        """Return the IDs of the k bridges with the lowest current BCIs,
+        from the lowest to the highest.
+        """
+
+        return [entry[2] for entry in self._entries[:max(k, 0)]]
+
+
+def build_bci_index(bridge_data: list[list]) -> BciIndex:
+    """Build a current-BCI index over the BridgeStore bridge_data, attach it to
+    bridge_data so that get_bridges_with_bci_below uses it and
+    inspect_bridges keeps it up to date, and return it.
+
+    >>> from copy import deepcopy
+    >>> from bridge_functions import THREE_BRIDGES, inspect_bridges
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore(deepcopy(THREE_BRIDGES))
+    >>> index = build_bci_index(bridges)
+    >>> inspect_bridges(bridges, [3], '09/15/2018', 60.0)
+    >>> index.worst(2)
+    [3, 2]
+    """
+
+    index = BciIndex(bridge_data)
+    attach_index(bridge_data, index)
+    return index
@@ -0,0 +1,161 @@
+"""BCI scores by year, for trend analysis over the whole inventory.
+
+In the raw bridge data the BCI columns after CURRENT BCI hold one score per
+year, from 2013 back to 2000, with gaps for the years a bridge was not
+scored. format_bcis keeps only the scores that are there, so the year of
+each score is lost. A BciSeries keeps them in a years x bridges NumPy
+matrix, with the earliest year first and NaN for every gap, and answers
+questions about how the whole inventory deteriorates with array operations
+instead of loops over bridges.
+
+The CURRENT BCI column repeats the latest yearly score of almost every
+bridge and has no year of its own, so it is not kept.
+
+NumPy is optional. Without it this module can still be imported, but a
+BciSeries cannot be built.
+"""
+
+import csv
+from typing import Iterable, TextIO
+
+from constants import BCIS_INDEX
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The years of the yearly BCI columns of the raw bridge data, in the order
+# of the columns.
+BCI_YEARS = list(range(2013, 1999, -1))
+
+
+class BciSeries:
+    """The yearly BCI scores of the bridges in raw bridge data.
+
+    Bridges are identified by the IDs format_data gives them: their
+    positions in the data, counting from 1.
+
+    >>> rows = [['1 -  32/', 'A', '403'] + [''] * 9 + ['72.3', '72.3', '',
+    ...          '69.5', '', '70'], ['2 -  43/', 'B', '403'] + [''] * 9
+    ...         + ['71.5', '71.5', '', '', '', '78.1']]
+    >>> series = BciSeries(rows, [2013, 2012, 2011, 2010, 2009])
+    >>> series.years.tolist()
+    [2009, 2010, 2011, 2012, 2013]
+    >>> series.series(1)
+    [(2009, 70.0), (2011, 69.5), (2013, 72.3)]
+    >>> series.scores[:, 1].tolist()
+    [78.1, nan, nan, nan, 71.5]
+    """
+
+    def __init__(self, rows: Iterable[list[str]],
+                 years: list[int] = BCI_YEARS) -> None:
+        """Initialize the series with the yearly scores of the uncleaned
+        bridge records rows, whose yearly BCI columns are for the years
+        years, in order.
+        """
+
+        if np is None:
+            raise ImportError('BciSeries requires NumPy')
+        first = BCIS_INDEX + 1
+        scores = [[float(value) if value != '' else np.nan
+                   for value in row[first:first + len(years)]]
+                  for row in rows]
+        matrix = np.array(scores, dtype=np.float64).reshape(-1, len(years))
+        order = np.argsort(years, kind='stable')
+        self.years = np.asarray(years)[order]
+        self.scores = np.ascontiguousarray(matrix.T[order])
+        self.ids = np.arange(1, len(scores) + 1)
+
+    def series(self, bridge_id: int) -> list[tuple[int, float]]:
+        """Return the (year, score) pairs of the bridge with ID bridge_id,
+        earliest first. Raise KeyError if there is no such bridge.
+        """
+
+        if not 1 <= bridge_id <= len(self.ids):
+            raise KeyError(bridge_id)
+        column = self.scores[:, bridge_id - 1]
+        return [(int(year), float(score))
+                for (year, score) in zip(self.years, column)
+                if not np.isnan(score)]
+
+    def slopes(self, min_scores: int = 2):
+        """Return an array with the least-squares slope of the scores of
+        each bridge against their years, in BCI points per year: negative
+        for a bridge that is deteriorating. The slope of a bridge with fewer
+        than min_scores scores is NaN.
+
+        >>> rows = [['1'] + [''] * 12 + ['70', '72', '74'],
+        ...         ['2'] + [''] * 12 + ['60', '', '66'],
+        ...         ['3'] + [''] * 12 + ['80', '', '']]
+        >>> BciSeries(rows, [2013, 2012, 2011]).slopes().tolist()
+        [-2.0, -3.0, nan]
+        """
+
+        scored = ~np.isnan(self.scores)
+        counts = scored.sum(axis=0)
+        years = np.broadcast_to(self.years[:, np.newaxis].astype(np.float64),
+                                self.scores.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            year_means = np.where(scored, years, 0.0).sum(axis=0) / counts
+            score_means = np.where(scored, self.scores,
+                                   0.0).sum(axis=0) / counts
+            year_offsets = np.where(scored, years - year_means, 0.0)
+            score_offsets = np.where(scored, self.scores - score_means, 0.0)
+            slopes = ((year_offsets * score_offsets).sum(axis=0)
+                      / (year_offsets ** 2).sum(axis=0))
+        slopes[counts < max(min_scores, 2)] = np.nan
+        return slopes
+
+    def year_over_year(self):
+        """Return a matrix, shaped like scores, holding for each year and
+        bridge the change in the bridge's score since its previous score:
+        negative for a drop. The change is NaN where the bridge has no score
+        that year or no earlier score.
+
+        >>> rows = [['1'] + [''] * 12 + ['66', '', '70', '71']]
+        >>> BciSeries(rows, [2013, 2012, 2011, 2010]).year_over_year().tolist()
+        [[nan], [-1.0], [nan], [-4.0]]
+        """
+
+        scored = ~np.isnan(self.scores)
+        rows = np.arange(len(self.years))[:, np.newaxis]
+        latest = np.maximum.accumulate(np.where(scored, rows, -1), axis=0)
+        previous = np.vstack([np.full((1, len(self.ids)), -1), latest[:-1]])
+        previous_scores = np.take_along_axis(self.scores,
+                                             np.maximum(previous, 0), axis=0)
+        return np.where(previous >= 0, self.scores - previous_scores, np.nan)
+
+    def bridges_fallen(self, points: float, years: int) -> list[int]:
+        """Return the IDs of the bridges whose score fell by more than
+        points between two years at most years years apart, in order.
+
+        >>> rows = [['1'] + [''] * 12 + ['60', '', '70'],
+        ...         ['2'] + [''] * 12 + ['', '64', '70'],
+        ...         ['3'] + [''] * 12 + ['75', '', '70']]
+        >>> series = BciSeries(rows, [2013, 2012, 2011])
+        >>> series.bridges_fallen(5, 1), series.bridges_fallen(5, 2)
+        ([2], [1, 2])
+        """
+
+        fallen = np.zeros(len(self.ids), dtype=bool)
+        for earlier in range(len(self.years)):
+            for later in range(earlier + 1, len(self.years)):
+                if self.years[later] - self.years[earlier] <= years:
+                    fallen |= (self.scores[earlier]
+                               - self.scores[later]) > points
+        return self.ids[fallen].tolist()
+
+
+def read_bci_series(csv_file: TextIO) -> BciSeries:
+    """Return the yearly BCI scores of the bridges in the open CSV file
+    csv_file, taking the years of the yearly BCI columns from its second
+    header line.
+    """
+
+    lines = csv.reader(csv_file)
+    next(lines, None)
+    header = next(lines, [])
+    years = [int(year) for year in header[BCIS_INDEX + 1:] if year.strip()]
+    return BciSeries(lines, years)
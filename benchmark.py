@@ -0,0 +1,332 @@
+"""Benchmarks for bridge_functions.py on synthetic bridge inventories.
+
+The inventories are written as CSV files in the same raw layout as
+bridge_data.csv: two header lines, then one line per bridge with its ID,
+name, highway, location, years, span details, deck length, last inspection
+date, current BCI and yearly BCIs from 2013 back to 2000, many of them
+blank. Bridges are placed in clusters around Ontario cities.
+
+Every benchmark reports the number of calls made, the total time, the
+calls (and, for read_data and format_data, rows) per second, and the peak
+memory allocated during the calls as traced by tracemalloc. Tracing memory
+slows Python code down, so use --no-memory for timings that are comparable
+with untraced code.
+
+Run, for example:
+
+    python benchmark.py --sizes 10000 100000 1000000 --output results.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator, Optional, TextIO
+
+import bridge_functions as bf
+from bci_history import build_bci_stats
+from bci_index import build_bci_index
+from bridge_store import BridgeStore
+from constants import (
+    ID_INDEX, LAT_INDEX, LON_INDEX, NUM_SPANS_INDEX, SPAN_DETAILS_INDEX)
+from highway_index import build_highway_aggregates
+from name_index import build_name_index
+from spatial_index import build_spatial_index
+
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_QUERIES = 100
+
+# (latitude, longitude, spread in degrees, weight) of each cluster.
+CLUSTERS = [(43.70, -79.42, 0.35, 30), (45.42, -75.70, 0.25, 10),
+            (43.25, -79.87, 0.20, 8), (42.98, -81.25, 0.20, 6),
+            (42.30, -83.00, 0.15, 4), (44.23, -76.48, 0.15, 3),
+            (46.49, -80.99, 0.30, 3), (48.38, -89.25, 0.25, 2),
+            (44.50, -79.50, 1.50, 20), (47.50, -82.00, 2.50, 14)]
+HIGHWAYS = ['401', '403', '404', '400', '402', '405', '407', '409', '410',
+            '416', '417', '427', '6', '7', '8', '10', '11', '17', '24', '69']
+NAME_WORDS = ['CREEK', 'RIVER', 'UNDERPASS', 'OVERPASS', 'BRIDGE', 'CULVERT',
+              'STREET', 'ROAD', 'RAILWAY', 'INTERCHANGE', 'DRAIN', 'WEST',
+              'EAST', 'NORTH', 'SOUTH', 'MAPLE', 'STOKES', 'MILL', 'HUMBER',
+              'CREDIT', 'GRAND', 'THAMES', 'OTTAWA', 'Highway', 'Ramp']
+HEADERS = [
+    ['', '', 'LOCATION INFORMATION'] + [''] * 24,
+    ['ID', 'STRUCTURE', 'HWY NAME', 'LATITUDE', 'LONGITUDE', 'YEAR BUILT',
+     'LAST MAJOR REHAB ', 'LASTMINOR REHAB', '# OF SPANS', 'SPAN DETAILS',
+     'DECK LENGTH', 'LAST INSPECTION DATE', 'CURRENTBCI']
+    + [str(year) for year in range(2013, 1999, -1)]]
+NUM_YEARS = 14
+
+
+def generate_row(number: int, rng: random.Random) -> list[str]:
+    """Return a synthetic raw bridge row, in the layout of bridge_data.csv,
+    for the bridge numbered number, drawing random values from rng.
+
+    >>> row = generate_row(1, random.Random(0))
+    >>> len(row)
+    27
+    >>> bf.format_record(row, 1)
+    >>> row[ID_INDEX], row[NUM_SPANS_INDEX] == len(row[SPAN_DETAILS_INDEX])
+    (1, True)
+    """
+
+    lat, lon, spread, _ = rng.choices(
+        CLUSTERS, weights=[cluster[3] for cluster in CLUSTERS])[0]
+    num_spans = rng.choice([1, 1, 1, 2, 2, 3, 3, 4, 5, 6])
+    spans = [round(rng.uniform(5, 40), 1) for _ in range(num_spans)]
+    year_built = rng.randint(1930, 2012)
+    bcis = []
+    bci = rng.uniform(55, 95)
+    for _ in range(NUM_YEARS):
+        bcis.append(f'{bci:.1f}' if rng.random() < 0.45 else '')
+        bci = min(bci + rng.uniform(-0.5, 2.5), 100.0)
+    current = next((value for value in bcis if value), '')
+    return [f'{number // 100} - {number % 100:3d}/',
+            ' '.join(rng.sample(NAME_WORDS, rng.randint(2, 4))),
+            rng.choice(HIGHWAYS),
+            f'{rng.gauss(lat, spread):.6f}', f'{rng.gauss(lon, spread):.6f}',
+            str(year_built),
+            str(rng.randint(year_built, 2015)) if rng.random() < 0.4 else '',
+            str(rng.randint(year_built, 2015)) if rng.random() < 0.6 else '',
+            str(num_spans),
+            f'Total={sum(spans):g}  '
+            + ''.join(f'({i + 1})={spans[i]:g};' for i in range(num_spans)),
+            f'{sum(spans) + rng.uniform(0, 5):.1f}',
+            f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/'
+            f'{rng.randint(2008, 2013)}',
+            current] + bcis
+
+
+def generate_rows(num_rows: int, seed: int = 0) -> Iterator[list[str]]:
+    """Yield num_rows synthetic raw bridge rows, the same ones for the same
+    seed.
+
+    >>> rows = list(generate_rows(3))
+    >>> len(rows), rows == list(generate_rows(3))
+    (3, True)
+    """
+
+    rng = random.Random(seed)
+    for number in range(1, num_rows + 1):
+        yield generate_row(number, rng)
+
+
+def write_inventory(csv_file: TextIO, num_rows: int, seed: int = 0) -> None:
+    """Write a synthetic inventory of num_rows bridges to the open file
+    csv_file, in the layout of bridge_data.csv.
+
+    >>> import io
+    >>> csv_file = io.StringIO()
+    >>> write_inventory(csv_file, 5)
+    >>> _ = csv_file.seek(0)
+    >>> len(bf.read_data(csv_file))
+    5
+    """
+
+    writer = csv.writer(csv_file, lineterminator='\n')
+    writer.writerows(HEADERS)
+    writer.writerows(generate_rows(num_rows, seed))
+
+
+def measure(results: dict, name: str, function: Callable[[], Any],
+            calls: int = 1, rows: int = 0,
+            trace_memory: bool = True) -> Any:
+    """Call function, which makes calls calls of the benchmarked operation
+    over rows rows, record its measurements in results under name, and
+    return what function returns.
+
+    >>> results = {}
+    >>> measure(results, 'sum', lambda: sum(range(1000)), calls=1)
+    499500
+    >>> sorted(results['sum'])
+    ['calls', 'calls_per_second', 'peak_memory_bytes', 'seconds']
+    """
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    result = {'calls': calls, 'seconds': seconds,
+              'calls_per_second': calls / seconds if seconds else None}
+    if rows:
+        result['rows_per_second'] = rows / seconds if seconds else None
+    if trace_memory:
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    results[name] = result
+    return value
+
+
+def _read(csv_path: str) -> list[list[str]]:
+    """Return the rows of the CSV file at csv_path, read with read_data."""
+
+    with open(csv_path, encoding='utf-8') as csv_file:
+        return bf.read_data(csv_file)
+
+
+def _build_indexes(bridge_data: list[list]) -> None:
+    """Build and attach every index the query functions can use."""
+
+    build_spatial_index(bridge_data)
+    build_name_index(bridge_data)
+    build_bci_index(bridge_data)
+    build_bci_stats(bridge_data)
+    build_highway_aggregates(bridge_data)
+
+
+def run_benchmarks(csv_path: str, num_queries: int = DEFAULT_QUERIES,
+                   seed: int = 0, indexed: bool = False,
+                   trace_memory: bool = True) -> dict:
+    """Return the measurements of every benchmark on the inventory in the
+    CSV file at csv_path, making num_queries calls of each query function
+    with arguments drawn with seed seed. If indexed is True, the data is
+    held in a BridgeStore and every index is built before the queries.
+
+    >>> folder = tempfile.TemporaryDirectory()
+    >>> csv_path = os.path.join(folder.name, 'bridges.csv')
+    >>> with open(csv_path, 'w', encoding='utf-8') as csv_file:
+    ...     write_inventory(csv_file, 50)
+    >>> results = run_benchmarks(csv_path, num_queries=2, indexed=True)
+    >>> results['format_data']['calls'], results['get_bridge']['calls']
+    (1, 2)
+    >>> results['get_closest_bridges_all']['calls']
+    1
+    >>> folder.cleanup()
+    """
+
+    results = {}
+    bridge_data = measure(results, 'read_data', lambda: _read(csv_path),
+                          trace_memory=trace_memory)
+    num_rows = len(bridge_data)
+    results['read_data']['rows_per_second'] = (
+        num_rows / results['read_data']['seconds'])
+    if indexed:
+        bridge_data = BridgeStore(bridge_data)
+    measure(results, 'format_data', lambda: bf.format_data(bridge_data),
+            rows=num_rows, trace_memory=trace_memory)
+    if indexed:
+        measure(results, 'build_indexes', lambda: _build_indexes(bridge_data),
+                rows=num_rows, trace_memory=trace_memory)
+
+    rng = random.Random(seed)
+    ids = [rng.randint(1, num_rows) for _ in range(num_queries)]
+    pairs = [(bridge_data[rng.randrange(num_rows)],
+              bridge_data[rng.randrange(num_rows)])
+             for _ in range(num_queries)]
+    locations = [(bridge[LAT_INDEX], bridge[LON_INDEX]) for bridge in
+                 (bridge_data[rng.randrange(num_rows)]
+                  for _ in range(num_queries))]
+    words = [rng.choice(NAME_WORDS).lower()[:rng.randint(2, 6)]
+             for _ in range(num_queries)]
+    highways = [rng.choice(HIGHWAYS) for _ in range(num_queries)]
+    inspectors = [list(location) for location in locations[:10]]
+
+    queries = [
+        ('get_bridge', lambda: [bf.get_bridge(bridge_data, bridge_id)
+                                for bridge_id in ids]),
+        ('get_average_bci', lambda: [bf.get_average_bci(bridge_data, i)
+                                     for i in ids]),
+        ('get_total_length_on_hwy',
+         lambda: [bf.get_total_length_on_hwy(bridge_data, highway)
+                  for highway in highways]),
+        ('get_distance_between', lambda: [bf.get_distance_between(*pair)
+                                          for pair in pairs]),
+        ('get_closest_bridge', lambda: [bf.get_closest_bridge(bridge_data, i)
+                                        for i in ids]),
+        ('get_closest_bridges',
+         lambda: [bf.get_closest_bridges(bridge_data, i, 5) for i in ids]),
+        ('get_bridges_in_radius',
+         lambda: [bf.get_bridges_in_radius(bridge_data, lat, lon, 10)
+                  for (lat, lon) in locations]),
+        ('get_bridges_with_bci_below',
+         lambda: [bf.get_bridges_with_bci_below(bridge_data, ids, limit)
+                  for limit in range(50, 50 + num_queries)]),
+        ('get_bridges_containing',
+         lambda: [bf.get_bridges_containing(bridge_data, word)
+                  for word in words]),
+    ]
+    for name, query in queries:
+        measure(results, name, query, calls=num_queries,
+                trace_memory=trace_memory)
+    # The batch functions are called once, with the arguments of all of
+    # the calls of the matching single query above.
+    measure(results, 'get_average_bcis',
+            lambda: bf.get_average_bcis(bridge_data, ids),
+            trace_memory=trace_memory)
+    measure(results, 'get_bridges_containing_each',
+            lambda: bf.get_bridges_containing_each(bridge_data, words),
+            trace_memory=trace_memory)
+    measure(results, 'get_closest_bridges_all',
+            lambda: bf.get_closest_bridges_all(bridge_data),
+            trace_memory=trace_memory)
+    measure(results, 'assign_inspectors',
+            lambda: bf.assign_inspectors(bridge_data, inspectors, 10),
+            trace_memory=trace_memory)
+    measure(results, 'inspect_bridges',
+            lambda: [bf.inspect_bridges(bridge_data, [i], '10/18/2026', 70.0)
+                     for i in ids], calls=num_queries,
+            trace_memory=trace_memory)
+    measure(results, 'ingest_inspections',
+            lambda: bf.ingest_inspections(
+                bridge_data, [(i, '10/19/2026', 68.0) for i in ids]),
+            calls=num_queries, trace_memory=trace_memory)
+    measure(results, 'add_rehab',
+            lambda: [bf.add_rehab(bridge_data, i, '10/18/2026', i % 2 == 0)
+                     for i in ids], calls=num_queries,
+            trace_memory=trace_memory)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Generate an inventory of each requested size, benchmark it, and
+    write the results as JSON.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of bridges to benchmark with')
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES,
+                        help='number of calls of each query function')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--indexed', action='store_true',
+                        help='build every index before the queries')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace peak memory')
+    parser.add_argument('--keep', metavar='FOLDER',
+                        help='write the generated CSV files to FOLDER')
+    parser.add_argument('--output', help='file to write (default: stdout)')
+    args = parser.parse_args(argv)
+
+    report = {'python': sys.version.split()[0],
+              'platform': platform.platform(),
+              'seed': args.seed, 'queries': args.queries,
+              'indexed': args.indexed, 'traced_memory': not args.no_memory,
+              'runs': []}
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            csv_path = os.path.join(args.keep or folder,
+                                    f'bridges_{size}.csv')
+            with open(csv_path, 'w', encoding='utf-8') as csv_file:
+                write_inventory(csv_file, size, args.seed)
+            report['runs'].append({
+                'rows': size,
+                'results': run_benchmarks(csv_path, args.queries, args.seed,
+                                          args.indexed, not args.no_memory)})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,7 +18,7 @@ Sharmin, and Jacqueline Smith
 import csv
 from copy import deepcopy
 from math import sin, cos, asin, radians, sqrt, inf
-from typing import TextIO
+from typing import Callable, Iterable, Iterator, Optional, TextIO
 
 
 from constants import (
@@ -31,6 +31,15 @@ from constants import (
     LOW_PRIORITY_BCI, HIGH_PRIORITY_RADIUS,
     MEDIUM_PRIORITY_RADIUS, LOW_PRIORITY_RADIUS,
     EARTH_RADIUS)
+from bci_history import BciStatsIndex, add_bci, average_bci
+from bci_index import BciIndex
+from bridge_store import BridgeStore, make_bridge_lookup
+from distance_kernel import CoordinateArrays
+from distance_service import DistanceService, bounding_box
+from highway_index import HighwayAggregates
+from index_registry import find_index, record_changed
+from name_index import NameIndex
+from spatial_index import SpatialIndex
 EPSILON = 0.01
 
 
@@ -44,8 +53,23 @@ def read_data(csv_file: TextIO) -> list[list[str]]:
 
     """
 
+    return list(iter_data(csv_file))
+
+
+def iter_data(csv_file: TextIO) -> Iterator[list[str]]:
+    """Yield the lines of the open CSV file csv_file one at a time, each as
+    a list of its values, skipping the two header lines. Only one line is
+    held in memory at a time.
+
+    >>> lines = iter_data(['header', 'header', 'a,b', 'c,d'])
+    >>> list(lines)
+    [['a', 'b'], ['c', 'd']]
+    """
+
     lines = csv.reader(csv_file)
-    return list(lines)[2:]
+    next(lines, None)
+    next(lines, None)
+    yield from lines
 
 
 # We provide this function for you to use as a helper.  This function
@@ -129,6 +153,8 @@ def get_bridge(bridge_data: list[list], bridge_id: int) -> list:
     """Return the data for the bridge with id bridge_id from bridge data
     bridge_data. If there is no bridge with id bridge_id, return [].
 
+    If bridge_data is a BridgeStore, the bridge is found without scanning.
+
     >>> result = get_bridge(THREE_BRIDGES, 1)
     >>> result == [
     ...    1, 'Highway 24 Underpass at Highway 403', '403', 43.167233,
@@ -138,8 +164,12 @@ def get_bridge(bridge_data: list[list], bridge_id: int) -> list:
     True
     >>> get_bridge(THREE_BRIDGES, 42)
     []
+    >>> get_bridge(BridgeStore(THREE_BRIDGES), 3)[NAME_INDEX]
+    'STOKES RIVER BRIDGE'
 
     """
+    if isinstance(bridge_data, BridgeStore):
+        return bridge_data.get(bridge_id)
     for bridge in bridge_data:
         if bridge[ID_INDEX] == bridge_id:
             return bridge
@@ -156,12 +186,51 @@ def get_average_bci(bridge_data: list[list], bridge_id: int) -> float:
     70.8857
     >>> get_average_bci(THREE_BRIDGES, 42)
     0.0
+
+    If running BCI statistics are attached to bridge_data (see
+    bci_history.build_bci_stats), or the bridge's BCIs are kept in a
+    BciHistory, the running sum is used instead of adding up the whole
+    history.
     """
-    bridge = get_bridge(bridge_data, bridge_id)
-    if bridge:
-        bcis = bridge[BCIS_INDEX]
-        return round(sum(bcis) / len(bcis), 4) if bcis else 0.0
-    return 0.0
+    return get_bridge_average_bci(get_bridge(bridge_data, bridge_id),
+                                  find_index(bridge_data, BciStatsIndex))
+
+
+def get_average_bcis(bridge_data: list[list],
+                     bridge_ids: Optional[list[int]] = None) -> list[float]:
+    """Return a list with get_average_bci(bridge_data, bridge_id) for each
+    bridge_id in bridge_ids, or for the ID of each bridge in bridge_data if
+    bridge_ids is None, looking up all of the bridges in a single pass.
+
+    >>> get_average_bcis(THREE_BRIDGES, [1, 42])
+    [70.8857, 0.0]
+    >>> get_average_bcis(THREE_BRIDGES)
+    [70.8857, 70.1429, 74.4]
+    """
+    if bridge_ids is None:
+        bridge_ids = [bridge[ID_INDEX] for bridge in bridge_data]
+    lookup = make_bridge_lookup(bridge_data)
+    index = find_index(bridge_data, BciStatsIndex)
+    return [get_bridge_average_bci(lookup(bridge_id), index)
+            for bridge_id in bridge_ids]
+
+
+def get_bridge_average_bci(bridge: list,
+                           index: Optional[BciStatsIndex]) -> float:
+    """Return the average BCI of the bridge record bridge as
+    get_average_bci computes it, or 0.0 if bridge is [], using the running
+    BCI statistics index unless it is None.
+
+    >>> get_bridge_average_bci(THREE_BRIDGES[2], None)
+    74.4
+    >>> get_bridge_average_bci([], None)
+    0.0
+    """
+    if not bridge:
+        return 0.0
+    if index is not None:
+        return index.average(bridge)
+    return average_bci(bridge[BCIS_INDEX])
 
 
 def get_total_length_on_hwy(bridge_data: list[list], highway: str) -> float:
@@ -170,12 +239,19 @@ def get_total_length_on_hwy(bridge_data: list[list], highway: str) -> float:
     bridge_data list as a float. If there are no bridges on the specified 
     highway, or if the highway does not exist in the data,the function 
     returns 0.0.
+
+    If per-highway totals have been built for bridge_data (see
+    highway_index.build_highway_aggregates), the total is read from them.
     
     >>> get_total_length_on_hwy(THREE_BRIDGES, '403')
     126.0
     >>> get_total_length_on_hwy(THREE_BRIDGES, '404')
     0.0
     """
+    aggregates = find_index(bridge_data, HighwayAggregates)
+    if aggregates is not None:
+        return aggregates.total_length(highway)
+
     total_length = 0.0
     for bridge in bridge_data:
         if bridge[HIGHWAY_INDEX] == highway:
@@ -210,6 +286,14 @@ def get_closest_bridge(bridge_data: list[list], bridge_id: int) -> int:
     excluding itself.Distance is determined by the geographical coordinates 
     in the bridge_data list of lists, where bridge_id is the integer identifier 
     of the reference bridge.
+
+    If a spatial index has been built for bridge_data, only the bridges it
+    reports as candidates are checked. Otherwise, if coordinate arrays have
+    been built for bridge_data (see distance_kernel.build_coordinate_arrays),
+    all distances are computed in one batch. Otherwise, if a distance
+    service has been built for bridge_data (see
+    distance_service.build_distance_service), its cached trigonometry is
+    used.
     
     >>> get_closest_bridge(THREE_BRIDGES, 1)
     2
@@ -220,6 +304,122 @@ def get_closest_bridge(bridge_data: list[list], bridge_id: int) -> int:
     if not reference_bridge:
         return -1
 
+    index = find_distance_index(bridge_data)
+    if isinstance(index, SpatialIndex):
+        bridge_data = get_nearest_candidates(bridge_data, index,
+                                             reference_bridge, 1)
+    elif isinstance(index, CoordinateArrays):
+        pos = index.closest_position(reference_bridge[LAT_INDEX],
+                                     reference_bridge[LON_INDEX], bridge_id)
+        return bridge_data[pos][ID_INDEX] if pos != -1 else -1
+    elif index is not None:
+        return index.closest(bridge_id)
+    return find_closest_bridge(bridge_data, reference_bridge)
+
+
+def find_distance_index(bridge_data: list[list]) -> Optional[object]:
+    """Return the index the distance queries use for bridge_data: its
+    spatial index, or else its coordinate arrays, or else its distance
+    service, or None if none of these is attached to it.
+
+    >>> find_distance_index(THREE_BRIDGES) is None
+    True
+    """
+    for index_type in (SpatialIndex, CoordinateArrays, DistanceService):
+        index = find_index(bridge_data, index_type)
+        if index is not None:
+            return index
+    return None
+
+
+def get_closest_bridges(bridge_data: list[list], bridge_id: int,
+                        k: int) -> list[int]:
+    """
+    Return the IDs of the k nearest bridges to the one specified by
+    bridge_id, excluding itself, nearest first. Bridges at the same distance
+    appear in the order they appear in bridge_data, so the first ID is the
+    one returned by get_closest_bridge. If there is no bridge with id
+    bridge_id, return [].
+
+    >>> get_closest_bridges(THREE_BRIDGES, 1, 2)
+    [2, 3]
+    >>> get_closest_bridges(THREE_BRIDGES, 3, 5)
+    [1, 2]
+    >>> get_closest_bridges(THREE_BRIDGES, 42, 1)
+    []
+    """
+    reference_bridge = get_bridge(bridge_data, bridge_id)
+    if not reference_bridge or k <= 0:
+        return []
+
+    index = find_index(bridge_data, SpatialIndex)
+    if index is not None:
+        bridge_data = get_nearest_candidates(bridge_data, index,
+                                             reference_bridge, k)
+    others = [bridge for bridge in bridge_data
+              if bridge[ID_INDEX] != bridge_id]
+    others.sort(key=lambda bridge: get_distance_between(reference_bridge,
+                                                        bridge))
+    return [bridge[ID_INDEX] for bridge in others[:k]]
+
+
+def get_closest_bridges_all(bridge_data: list[list]) -> list[int]:
+    """
+    Return a list with the ID of the nearest bridge to each bridge in
+    bridge_data, excluding itself, in the order of bridge_data. Each ID is
+    the one get_closest_bridge returns for that bridge; -1 stands for a
+    bridge with no other bridge to compare with.
+
+    A spatial index is used to avoid comparing every pair of bridges. If
+    none has been built for bridge_data, a temporary one is built.
+
+    >>> get_closest_bridges_all(THREE_BRIDGES)
+    [2, 1, 1]
+    >>> get_closest_bridges_all(UNIQUE)
+    [-1]
+    """
+    index = find_index(bridge_data, SpatialIndex)
+    if index is None:
+        index = SpatialIndex(bridge_data)
+
+    closest_ids = []
+    for bridge in bridge_data:
+        candidates = get_nearest_candidates(bridge_data, index, bridge, 1)
+        closest_ids.append(find_closest_bridge(candidates, bridge))
+    return closest_ids
+
+
+def get_nearest_candidates(bridge_data: list[list], index: SpatialIndex,
+                           reference_bridge: list, k: int) -> list[list]:
+    """Return the bridges from bridge_data that spatial index index reports
+    as possibly among the k nearest to reference_bridge, excluding bridges
+    with the same ID, in the order they appear in bridge_data.
+
+    >>> index = SpatialIndex(THREE_BRIDGES)
+    >>> candidates = get_nearest_candidates(THREE_BRIDGES, index,
+    ...                                     THREE_BRIDGES[2], 1)
+    >>> [bridge[ID_INDEX] for bridge in candidates]
+    [1]
+    """
+    bridge_id = reference_bridge[ID_INDEX]
+    positions = index.nearest_candidates(
+        reference_bridge[LAT_INDEX], reference_bridge[LON_INDEX], k,
+        lambda pos: bridge_data[pos][ID_INDEX] == bridge_id)
+    return [bridge_data[pos] for pos in positions]
+
+
+def find_closest_bridge(bridge_data: list[list],
+                        reference_bridge: list) -> int:
+    """Return the ID of the first bridge in bridge_data that is nearest to
+    reference_bridge, ignoring bridges with the same ID as reference_bridge.
+    Return -1 if there is no such bridge.
+
+    >>> find_closest_bridge(THREE_BRIDGES, THREE_BRIDGES[1])
+    1
+    >>> find_closest_bridge(UNIQUE, UNIQUE[0])
+    -1
+    """
+    bridge_id = reference_bridge[ID_INDEX]
     closest_bridge_id = -1
     min_distance = float('inf')
 
@@ -239,19 +439,53 @@ def get_bridges_in_radius(bridge_data: list[list], center_lat: float,
     Return a list of bridge IDs where each bridge from bridge_data is within a 
     specified radius (in km) of a geographical point defined by center_lat 
     and center_lon.
+
+    If a spatial index has been built for bridge_data (see
+    spatial_index.build_spatial_index), only the bridges it reports as
+    candidates are checked. Otherwise, if coordinate arrays have been built
+    for bridge_data, all distances are computed in one batch. Otherwise, if
+    a distance service has been built for bridge_data, its cached
+    trigonometry is used. A scan skips the bridges outside a latitude and
+    longitude box around the radius without computing their distances.
     
     >>> get_bridges_in_radius(THREE_BRIDGES, 43.7000, -79.4000, 300)
     [1, 2, 3]
     >>> get_bridges_in_radius(THREE_BRIDGES, 44.0000, -80.0000, 50)
     []
     """
+    index = find_distance_index(bridge_data)
+    if isinstance(index, SpatialIndex):
+        bridge_data = [bridge_data[pos] for pos in
+                       index.candidates_in_radius(center_lat, center_lon,
+                                                  radius)]
+    elif isinstance(index, CoordinateArrays):
+        return [bridge_data[pos][ID_INDEX] for pos in
+                index.positions_within(center_lat, center_lon, radius)]
+    elif index is not None:
+        return index.ids_in_radius(center_lat, center_lon, radius)
+    return find_bridges_in_radius(bridge_data, center_lat, center_lon, radius)
+
+
+def find_bridges_in_radius(bridge_data: list[list], center_lat: float,
+                           center_lon: float, radius: float) -> list[int]:
+    """Return the IDs of the bridges in bridge_data within radius km of
+    location (center_lat, center_lon), in order, skipping the bridges
+    outside a latitude and longitude box around the radius without
+    computing their distances.
+
+    >>> find_bridges_in_radius(THREE_BRIDGES, 43.165, -80.26, 2)
+    [1, 2]
+    """
     bridges_in_radius = []
+    min_lat, max_lat, min_lon, max_lon = bounding_box(center_lat, center_lon,
+                                                      radius)
     for bridge in bridge_data:
         bridge_lat = bridge[LAT_INDEX]
         bridge_lon = bridge[LON_INDEX]
-        distance = calculate_distance(center_lat, center_lon, bridge_lat,
-                                      bridge_lon)
-        if distance <= radius:
+        if (min_lat <= bridge_lat <= max_lat
+                and min_lon <= bridge_lon <= max_lon
+                and calculate_distance(center_lat, center_lon, bridge_lat,
+                                       bridge_lon) <= radius):
             bridges_in_radius.append(bridge[ID_INDEX])
     return bridges_in_radius
 
@@ -270,17 +504,50 @@ def get_bridges_with_bci_below(bridge_data: list[list], bridge_ids: list[int],
     []
     >>> get_bridges_with_bci_below(THREE_BRIDGES, [2, 3], 65)
     []
+
+    If a current-BCI index has been built for bridge_data (see
+    bci_index.build_bci_index), the current BCI of each ID in bridge_ids is
+    looked up in it, so a call costs time proportional to len(bridge_ids).
     """
+    current_bci = make_current_bci_lookup(bridge_data)
     bridges_below_bci = []
-    existing_ids = [bdg[ID_INDEX] for bdg in bridge_data]
     for bridge_id in bridge_ids:
-        bridge = get_bridge(bridge_data, bridge_id)
-        if bridge_id in existing_ids and bridge[BCIS_INDEX] != []:
-            if bridge[BCIS_INDEX][0] <= bci_limit:
-                bridges_below_bci.append(bridge_id)
+        bci = current_bci(bridge_id)
+        if bci is not None and bci <= bci_limit:
+            bridges_below_bci.append(bridge_id)
     return bridges_below_bci
 
 
+def make_current_bci_lookup(bridge_data: list[list]
+                            ) -> Callable[[int], Optional[float]]:
+    """Return a function that, given a bridge ID, returns the current BCI of
+    the first bridge in bridge_data with that ID, or None if there is no
+    such bridge or it has no BCIs. The current BCIs are read from a
+    current-BCI index if one has been built for bridge_data.
+
+    >>> current_bci = make_current_bci_lookup(THREE_BRIDGES)
+    >>> current_bci(3), current_bci(42)
+    (85.1, None)
+    """
+    index = find_index(bridge_data, BciIndex)
+    if index is not None:
+        return index.current_bci
+    lookup = make_bridge_lookup(bridge_data)
+    return lambda bridge_id: get_current_bci(lookup(bridge_id))
+
+
+def get_current_bci(bridge: list) -> Optional[float]:
+    """Return the current BCI of the bridge record bridge, or None if bridge
+    is [] or has no BCIs.
+
+    >>> get_current_bci(THREE_BRIDGES[0]), get_current_bci([])
+    (72.3, None)
+    """
+    if bridge and bridge[BCIS_INDEX]:
+        return bridge[BCIS_INDEX][0]
+    return None
+
+
 def get_bridges_containing(bridge_data: list[list],
                            search_string: str) -> list[int]:
     """
@@ -294,13 +561,46 @@ def get_bridges_containing(bridge_data: list[list],
     >>> get_bridges_containing(THREE_BRIDGES, 'RIVER')
     [3]
     """
+    index = find_index(bridge_data, NameIndex)
+    if index is not None:
+        return [bridge_data[pos][ID_INDEX]
+                for pos in index.positions_containing(search_string)]
+
     matching_bridge_ids = []
+    search_string_lowercase = search_string.lower()
+    for bridge in bridge_data:
+        if search_string_lowercase in bridge[NAME_INDEX].lower():
+            matching_bridge_ids.append(bridge[ID_INDEX])
+    return matching_bridge_ids
+
+
+def get_bridges_containing_each(bridge_data: list[list],
+                                search_strings: list[str]) -> list[list[int]]:
+    """Return a list with, for each string in search_strings, the list of
+    IDs of the bridges in bridge data bridge_data whose names contain that
+    string, case-insensitive, as get_bridges_containing would return it.
 
+    Without a name index (see name_index.build_name_index), each bridge name
+    is lowercased once for all of the search strings.
+
+    >>> get_bridges_containing_each(THREE_BRIDGES, ['underpass', 'RIVER'])
+    [[1, 2], [3]]
+    >>> get_bridges_containing_each(THREE_BRIDGES, [])
+    []
+    """
+    index = find_index(bridge_data, NameIndex)
+    if index is not None:
+        return [get_bridges_containing(bridge_data, search_string)
+                for search_string in search_strings]
+
+    lowercase_strings = [search_string.lower()
+                         for search_string in search_strings]
+    matching_bridge_ids = [[] for _ in search_strings]
     for bridge in bridge_data:
         bridge_name_lowercase = bridge[NAME_INDEX].lower()
-        search_string_lowercase = search_string.lower()
-        if search_string_lowercase in bridge_name_lowercase:
-            matching_bridge_ids.append(bridge[ID_INDEX])
+        for i in range(len(lowercase_strings)):
+            if lowercase_strings[i] in bridge_name_lowercase:
+                matching_bridge_ids[i].append(bridge[ID_INDEX])
     return matching_bridge_ids
 
 
@@ -315,6 +615,14 @@ def assign_inspectors(bridge_data: list[list], inspectors: list[list[float]],
     inspector that can inspect that bridge).
 
     See the "Assigning Inspectors" section of the handout for more details.
+    For large inputs, assignment.assign_inspectors_indexed gives the same
+    result faster.
+
+    If coordinate arrays have been built for bridge_data (and no spatial
+    index has), the distances from each inspector to every bridge are
+    computed in one batch and shared by the three priority levels. The
+    radius checks use an attached distance service as get_bridges_in_radius
+    does.
 
     >>> assign_inspectors(THREE_BRIDGES, [[43.10, -80.15], [42.10, -81.15]], 0)
     [[], []]
@@ -337,7 +645,7 @@ def assign_inspectors(bridge_data: list[list], inspectors: list[list[float]],
 
     """
     assigned_bridges = [[] for i in inspectors]
-    all_assigned_ids = []
+    all_assigned_ids = set()
 
     radius_priorities = [HIGH_PRIORITY_RADIUS, MEDIUM_PRIORITY_RADIUS,
                          LOW_PRIORITY_RADIUS]
@@ -361,7 +669,7 @@ def assign_inspectors(bridge_data: list[list], inspectors: list[list[float]],
                     if bridge_id not in all_assigned_ids \
                        and len(assigned_list) < max_bridges:
                         assigned_bridges[inspector_idx].append(bridge_id)
-                        all_assigned_ids.append(bridge_id)
+                        all_assigned_ids.add(bridge_id)
 
     return assigned_bridges
 
@@ -376,6 +684,9 @@ def inspect_bridges(bridge_data: list[list], bridge_ids: list[int], date: str,
     """Update the bridges in bridge_data with id in bridge_ids with the new
     date and bci score for a new inspection.
 
+    Running BCI statistics attached to bridge_data (see
+    bci_history.build_bci_stats) are updated in constant time.
+
     >>> bridges = deepcopy(THREE_BRIDGES)
     >>> inspect_bridges(bridges, [1], '09/15/2018', 71.9)
     >>> bridges == [
@@ -398,11 +709,52 @@ def inspect_bridges(bridge_data: list[list], bridge_ids: list[int], date: str,
     ... [65.0, 71.5, 68.1, 69.0, 69.4, 69.4, 70.3, 73.3]]
     True
     """
+    lookup = make_bridge_lookup(bridge_data)
     for bridge_id in bridge_ids:
-        bridge = get_bridge(bridge_data, bridge_id)
+        bridge = lookup(bridge_id)
         if bridge:
             bridge[LAST_INSPECTED_INDEX] = date
-            bridge[BCIS_INDEX].insert(0, bci)
+            add_bci(bridge, bci)
+            record_changed(bridge_data, bridge)
+
+
+def ingest_inspections(bridge_data: list[list],
+                       inspections: Iterable[tuple[int, str, float]]) -> int:
+    """Update the bridges in bridge_data with each inspection (bridge_id,
+    date, bci) in inspections, in order, as inspect_bridges(bridge_data,
+    [bridge_id], date, bci) would, and return the number of inspections of
+    bridges found in bridge_data.
+
+    Each bridge is found with a single dictionary lookup, and running BCI
+    statistics attached to bridge_data are updated once per bridge. If an
+    inspection is malformed, the error is raised after the attached indexes
+    are told about the bridges already updated.
+
+    >>> bridges = deepcopy(THREE_BRIDGES)
+    >>> ingest_inspections(bridges, [(3, '09/15/2018', 80.1),
+    ...                              (42, '09/15/2018', 50.0),
+    ...                              (3, '10/11/2021', 78.2)])
+    2
+    >>> bridges[2][LAST_INSPECTED_INDEX], bridges[2][BCIS_INDEX][:3]
+    ('10/11/2021', [78.2, 80.1, 85.1])
+    >>> bridges[:2] == THREE_BRIDGES[:2]
+    True
+    """
+    lookup = make_bridge_lookup(bridge_data)
+    changed_bridges = {}
+    num_applied = 0
+    try:
+        for (bridge_id, date, bci) in inspections:
+            bridge = lookup(bridge_id)
+            if bridge:
+                bridge[LAST_INSPECTED_INDEX] = date
+                add_bci(bridge, bci)
+                changed_bridges[id(bridge)] = bridge
+                num_applied += 1
+    finally:
+        for bridge in changed_bridges.values():
+            record_changed(bridge_data, bridge)
+    return num_applied
 
 
 def add_rehab(bridge_data: list[list], bridge_id: int, date: str,
@@ -434,6 +786,7 @@ def add_rehab(bridge_data: list[list], bridge_id: int, date: str,
             bridge[LAST_MAJOR_INDEX] = rehab_year
         else:
             bridge[LAST_MINOR_INDEX] = rehab_year
+        record_changed(bridge_data, bridge)
 
 
 # We provide the header and doctring for this function to help get you started.
@@ -452,13 +805,55 @@ def format_data(data: list[list[str]]) -> None:
     True
     """
     for i in range(len(data)):
-        data[i][ID_INDEX] = i + 1
+        format_record(data[i], i + 1)
+    if isinstance(data, BridgeStore):
+        data.reindex()
+
+
+def iter_formatted(data: Iterable[list[str]]) -> Iterator[list]:
+    """Yield the records of the uncleaned bridge data data one at a time,
+    each formatted as format_data would format it, with IDs numbered from 1
+    in the order the records are read. data may be any iterable, such as
+    iter_data(csv_file), so a whole file is never held in memory.
+
+    >>> row = ['2 -  29/', 'MAPLE STREET OVERPASS', '402', '42.956781',
+    ...        '-81.346897', '1972', '2015', '2010', '3',
+    ...        'Total=48.5  (1)=15.5;(2)=18;(3)=15;', '49.5', '07/11/2015',
+    ...        '70.2', '', '70.2', '', '68.9', '', '69.3', '', '69.3', '',
+    ...        '70.1', '', '70.8', '71.4', '']
+    >>> records = iter_formatted([row, deepcopy(row)])
+    >>> next(records) == UNIQUE[0]
+    True
+    >>> [bridge[ID_INDEX] for bridge in records]
+    [2]
+    """
+
+    bridge_id = 0
+    for bridge_record in data:
+        bridge_id += 1
+        format_record(bridge_record, bridge_id)
+        yield bridge_record
+
+
+def format_record(bridge_record: list, bridge_id: int) -> None:
+    """Format the uncleaned bridge record bridge_record and give it the ID
+    bridge_id.
+
+    >>> record = ['2 -  29/', 'MAPLE STREET OVERPASS', '402', '42.956781',
+    ...           '-81.346897', '1972', '2015', '2010', '3',
+    ...           'Total=48.5  (1)=15.5;(2)=18;(3)=15;', '49.5', '07/11/2015',
+    ...           '70.2', '', '70.2', '', '68.9', '', '69.3', '', '69.3', '',
+    ...           '70.1', '', '70.8', '71.4', '']
+    >>> format_record(record, 7)
+    >>> record == [7] + UNIQUE[0][1:]
+    True
+    """
 
-    for listsub in data:
-        format_location(listsub)
-        format_length(listsub)
-        format_bcis(listsub)
-        format_spans(listsub)
+    bridge_record[ID_INDEX] = bridge_id
+    format_location(bridge_record)
+    format_length(bridge_record)
+    format_bcis(bridge_record)
+    format_spans(bridge_record)
 
 
 # This is a suggested helper function for format_data. We provide the
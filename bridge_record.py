@@ -0,0 +1,269 @@
+"""A compact record type for formatted bridges.
+
+A formatted bridge record is a list of 13 values whose location, length,
+span lengths and BCIs are all separately allocated floats. A Bridge holds
+its strings in named slots, sharing one copy of each repeated string such
+as a highway name, a year or a date, and keeps all of its numbers in a
+single array of doubles: latitude, longitude, length, then the span
+lengths, then the BCIs.
+
+A Bridge can be indexed with the *_INDEX constants and compares equal to
+the list it was made from, so it can be used wherever bridge_functions
+expects a formatted bridge record, in less than half the memory. The
+location and length are returned as floats; the span lengths and BCIs are
+returned as views of the array, which can be changed in place like the
+lists they stand for.
+"""
+
+import sys
+from array import array
+from collections.abc import MutableSequence
+from typing import Iterable, Iterator
+
+from bridge_store import BridgeStore
+from constants import (
+    ID_INDEX, NAME_INDEX, HIGHWAY_INDEX, LAT_INDEX, LON_INDEX, YEAR_INDEX,
+    LAST_MAJOR_INDEX, LAST_MINOR_INDEX, NUM_SPANS_INDEX, SPAN_DETAILS_INDEX,
+    LENGTH_INDEX, LAST_INSPECTED_INDEX, BCIS_INDEX)
+
+
+NUM_FIELDS = 13
+# Maps the index of each field kept in a slot to the name of the slot.
+SLOTS = {ID_INDEX: 'bridge_id', NAME_INDEX: 'name', HIGHWAY_INDEX: 'highway',
+         YEAR_INDEX: 'year', LAST_MAJOR_INDEX: 'last_major',
+         LAST_MINOR_INDEX: 'last_minor',
+         LAST_INSPECTED_INDEX: 'last_inspected'}
+# The slots whose strings are interned.
+INTERNED_SLOTS = {'highway', 'year', 'last_major', 'last_minor',
+                  'last_inspected'}
+# Maps the index of each number kept at the start of the array to its
+# position in the array.
+NUMBERS = {LAT_INDEX: 0, LON_INDEX: 1, LENGTH_INDEX: 2}
+
+
+class NumberView(MutableSequence):
+    """The span lengths or the BCIs of a Bridge, as a mutable sequence that
+    reads and writes the Bridge's array.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> bridge = Bridge(THREE_BRIDGES[0])
+    >>> bcis = bridge[BCIS_INDEX]
+    >>> bcis.insert(0, 71.9)
+    >>> bridge[BCIS_INDEX][:3], len(bcis), bcis == bridge.to_list()[12]
+    ([71.9, 72.3, 69.5], 8, True)
+    >>> bridge[SPAN_DETAILS_INDEX]
+    [12.0, 19.0, 21.0, 12.0]
+    """
+
+    __slots__ = ('_bridge', '_is_spans')
+
+    def __init__(self, bridge: 'Bridge', is_spans: bool) -> None:
+        """Initialize a view of the span lengths of bridge if is_spans is
+        True, or of its BCIs otherwise.
+        """
+
+        self._bridge = bridge
+        self._is_spans = is_spans
+
+    def _bounds(self) -> tuple[int, int]:
+        """Return the positions in the array where the viewed numbers start
+        and end.
+        """
+
+        spans_end = len(NUMBERS) + self._bridge.num_spans
+        if self._is_spans:
+            return (len(NUMBERS), spans_end)
+        return (spans_end, len(self._bridge.numbers))
+
+    def _position(self, i: int) -> int:
+        """Return the position in the array of the number at index i."""
+
+        start, end = self._bounds()
+        if i < 0:
+            i += end - start
+        if not 0 <= i < end - start:
+            raise IndexError('index out of range')
+        return start + i
+
+    def __len__(self) -> int:
+        start, end = self._bounds()
+        return end - start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        return self._bridge.numbers[self._position(i)]
+
+    def __setitem__(self, i, value) -> None:
+        if isinstance(i, slice):
+            values = self.tolist()
+            values[i] = value
+            self._replace(values)
+        else:
+            self._bridge.numbers[self._position(i)] = value
+
+    def __delitem__(self, i) -> None:
+        values = self.tolist()
+        del values[i]
+        self._replace(values)
+
+    def insert(self, index: int, value: float) -> None:
+        """Insert value before index index."""
+
+        start, end = self._bounds()
+        index = min(max(index + (end - start) if index < 0 else index, 0),
+                    end - start)
+        self._bridge.numbers.insert(start + index, value)
+        if self._is_spans:
+            self._bridge.num_spans += 1
+
+    def _replace(self, values: Iterable[float]) -> None:
+        """Replace the viewed numbers with values."""
+
+        start, end = self._bounds()
+        values = array('d', values)
+        self._bridge.numbers[start:end] = values
+        if self._is_spans:
+            self._bridge.num_spans = len(values)
+
+    def __iter__(self) -> Iterator[float]:
+        start, end = self._bounds()
+        return iter(self._bridge.numbers[start:end])
+
+    def tolist(self) -> list[float]:
+        """Return a list of the viewed numbers."""
+
+        start, end = self._bounds()
+        return self._bridge.numbers[start:end].tolist()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NumberView):
+            other = other.tolist()
+        if not isinstance(other, list):
+            return NotImplemented
+        return self.tolist() == other
+
+    def __repr__(self) -> str:
+        return repr(self.tolist())
+
+
+class Bridge:
+    """A formatted bridge record stored compactly.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> bridge = Bridge(THREE_BRIDGES[0])
+    >>> bridge[BCIS_INDEX][0], bridge[LAT_INDEX], bridge.highway
+    (72.3, 43.167233, '403')
+    >>> bridge == THREE_BRIDGES[0], bridge == THREE_BRIDGES[1]
+    (True, False)
+    >>> bridge[LAST_INSPECTED_INDEX] = '10/18/2026'
+    >>> bridge.last_inspected
+    '10/18/2026'
+    >>> bridge[SPAN_DETAILS_INDEX] = [30.0, 34.0]
+    >>> bridge[NUM_SPANS_INDEX], bridge[BCIS_INDEX][0]
+    (2, 72.3)
+    """
+
+    __slots__ = tuple(SLOTS.values()) + ('num_spans', 'numbers')
+
+    def __init__(self, record: list) -> None:
+        """Initialize a bridge with the values of the formatted bridge
+        record record.
+        """
+
+        self.num_spans = 0
+        self.numbers = array('d', [0.0] * len(NUMBERS))
+        for field_index in range(NUM_FIELDS):
+            if field_index != NUM_SPANS_INDEX:
+                self[field_index] = record[field_index]
+
+    def __getitem__(self, field_index):
+        """Return the value of field field_index, or a list of the values of
+        the fields in slice field_index.
+        """
+
+        if isinstance(field_index, slice):
+            return list(self)[field_index]
+        if field_index < 0:
+            field_index += NUM_FIELDS
+        if field_index in SLOTS:
+            return getattr(self, SLOTS[field_index])
+        if field_index in NUMBERS:
+            return self.numbers[NUMBERS[field_index]]
+        if field_index == NUM_SPANS_INDEX:
+            return self.num_spans
+        if field_index in (SPAN_DETAILS_INDEX, BCIS_INDEX):
+            return NumberView(self, field_index == SPAN_DETAILS_INDEX)
+        raise IndexError('field index out of range')
+
+    def __setitem__(self, field_index: int, value: object) -> None:
+        """Set field field_index to value. The number of spans always
+        follows the span lengths, so setting it has no effect.
+        """
+
+        if field_index < 0:
+            field_index += NUM_FIELDS
+        if field_index in SLOTS:
+            slot = SLOTS[field_index]
+            if slot in INTERNED_SLOTS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, slot, value)
+        elif field_index in NUMBERS:
+            self.numbers[NUMBERS[field_index]] = value
+        elif field_index in (SPAN_DETAILS_INDEX, BCIS_INDEX):
+            self[field_index]._replace(value)
+        elif field_index != NUM_SPANS_INDEX:
+            raise IndexError('field index out of range')
+
+    def __len__(self) -> int:
+        """Return the number of fields of a bridge."""
+
+        return NUM_FIELDS
+
+    def __iter__(self) -> Iterator[object]:
+        """Return an iterator over the values of the fields."""
+
+        return (self[field_index] for field_index in range(NUM_FIELDS))
+
+    def to_list(self) -> list:
+        """Return this bridge as a formatted bridge record, a list, with
+        its span lengths and BCIs as lists.
+        """
+
+        record = list(self)
+        record[SPAN_DETAILS_INDEX] = record[SPAN_DETAILS_INDEX].tolist()
+        record[BCIS_INDEX] = record[BCIS_INDEX].tolist()
+        return record
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether other is a Bridge or a list with the same values.
+        """
+
+        if isinstance(other, Bridge):
+            other = other.to_list()
+        if not isinstance(other, list):
+            return NotImplemented
+        return self.to_list() == other
+
+    def __repr__(self) -> str:
+        """Return a representation of this bridge as a list."""
+
+        return f'Bridge({self.to_list()!r})'
+
+
+def to_bridges(bridge_data: list[list]) -> list[Bridge]:
+    """Return a list with a Bridge for each formatted bridge record in
+    bridge_data, in order. If bridge_data is a BridgeStore, so is the
+    result.
+
+    >>> from bridge_functions import THREE_BRIDGES, get_average_bci
+    >>> bridges = to_bridges(THREE_BRIDGES)
+    >>> bridges == THREE_BRIDGES
+    True
+    >>> get_average_bci(bridges, 1)
+    70.8857
+    """
+
+    bridges = [Bridge(record) for record in bridge_data]
+    return BridgeStore(bridges) if isinstance(bridge_data, BridgeStore) \
+        else bridges
@@ -0,0 +1,220 @@
+"""A list of formatted bridge records that can find a bridge by its ID
+without scanning the list.
+
+A BridgeStore is a list, so it can be passed to every function in
+bridge_functions.py; those functions use its ID lookup when they find
+a bridge by ID, and the indexes attached to it (see index_registry.py).
+"""
+
+from typing import Callable, Iterable
+
+from constants import ID_INDEX
+
+
+class BridgeStore(list):
+    """A list of bridge records that keeps a dictionary from each bridge ID
+    to the position of the first record with that ID.
+
+    The dictionary is kept up to date when records are added to the end of
+    the store, and rebuilt the next time it is needed after any other change
+    to the list. IDs of records must not be changed in place without
+    calling reindex afterwards.
+
+    version counts the changes to the list itself: every addition, removal,
+    replacement or reordering of records, and every call of reindex. indexes
+    maps each index type to the index of that type attached to the store
+    and the version it was attached at. Indexes are not copied with the
+    store.
+
+    >>> store = BridgeStore([[1, 'A'], [2, 'B']])
+    >>> store.get(2)
+    [2, 'B']
+    >>> store.append([3, 'C'])
+    >>> store.position(3)
+    2
+    >>> del store[0]
+    >>> store.position(3)
+    1
+    >>> store.get(1)
+    []
+    >>> store == [[2, 'B'], [3, 'C']]
+    True
+    """
+
+    def __init__(self, bridge_data: Iterable[list] = ()) -> None:
+        """Initialize a new store with the records in bridge_data."""
+
+        super().__init__(bridge_data)
+        self._positions = None
+        self.version = 0
+        self.indexes = {}
+
+    def __reduce__(self) -> tuple:
+        """Copy or pickle a store as a new store with the same records."""
+
+        return (BridgeStore, (list(self),))
+
+    def reindex(self) -> None:
+        """Rebuild the dictionary from bridge IDs to positions, after IDs
+        of records were changed in place.
+        """
+
+        self._build_positions()
+        self.version += 1
+
+    def _build_positions(self) -> None:
+        """Build the dictionary from bridge IDs to positions."""
+
+        positions = {}
+        for pos in range(len(self)):
+            positions.setdefault(self[pos][ID_INDEX], pos)
+        self._positions = positions
+
+    def position(self, bridge_id: int) -> int:
+        """Return the position of the first record with id bridge_id, or -1
+        if there is no such record.
+        """
+
+        if self._positions is None:
+            self._build_positions()
+        return self._positions.get(bridge_id, -1)
+
+    def get(self, bridge_id: int) -> list:
+        """Return the first record with id bridge_id, or [] if there is no
+        such record.
+        """
+
+        pos = self.position(bridge_id)
+        return self[pos] if pos != -1 else []
+
+    def append(self, record: list) -> None:
+        """Add record to the end of this store."""
+
+        super().append(record)
+        self.version += 1
+        if self._positions is not None:
+            self._positions.setdefault(record[ID_INDEX], len(self) - 1)
+
+    def extend(self, records: Iterable[list]) -> None:
+        """Add the records in records to the end of this store."""
+
+        for record in records:
+            self.append(record)
+
+    def __iadd__(self, records: Iterable[list]) -> 'BridgeStore':
+        self.extend(records)
+        return self
+
+    def _changed(self) -> None:
+        """Forget the dictionary from bridge IDs to positions, after a
+        change to the list.
+        """
+
+        self._positions = None
+        self.version += 1
+
+    def insert(self, pos: int, record: list) -> None:
+        """Insert record before position pos."""
+
+        super().insert(pos, record)
+        self._changed()
+
+    def pop(self, pos: int = -1) -> list:
+        """Remove and return the record at position pos."""
+
+        record = super().pop(pos)
+        self._changed()
+        return record
+
+    def remove(self, record: list) -> None:
+        """Remove the first occurrence of record."""
+
+        super().remove(record)
+        self._changed()
+
+    def clear(self) -> None:
+        """Remove all records from this store."""
+
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:
+        """Sort the records in this store in place, like list.sort."""
+
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        """Reverse the order of the records in this store."""
+
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._changed()
+
+    def replace(self, pos: int, record: list) -> None:
+        """Replace the record at position pos with record. Unlike assigning
+        to self[pos], this keeps the dictionary if the ID is unchanged.
+
+        >>> store = BridgeStore([[1, 'A'], [2, 'B']])
+        >>> store.replace(1, [2, 'C'])
+        >>> store.get(2)
+        [2, 'C']
+        """
+
+        old_id = self[pos][ID_INDEX]
+        super().__setitem__(pos, record)
+        self.version += 1
+        if record[ID_INDEX] != old_id:
+            self._positions = None
+
+    def copy(self) -> 'BridgeStore':
+        """Return a new store with the same records, without rebuilding the
+        dictionary.
+
+        >>> store = BridgeStore([[1, 'A'], [2, 'B']])
+        >>> copied = store.copy()
+        >>> copied.append([3, 'C'])
+        >>> store.position(3), copied.position(3)
+        (-1, 2)
+        """
+
+        store = BridgeStore(self)
+        if self._positions is not None:
+            store._positions = self._positions.copy()
+        return store
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._changed()
+
+    def __imul__(self, times: int) -> 'BridgeStore':
+        result = super().__imul__(times)
+        self._changed()
+        return result
+
+
+def make_bridge_lookup(bridge_data: list[list]) -> Callable[[int], list]:
+    """Return a function that, given a bridge ID, returns the first record
+    in bridge_data with that ID, or [] if there is none.
+
+    For a BridgeStore this uses its own dictionary; for any other list a
+    dictionary is built once, so looking up many IDs costs a single scan of
+    bridge_data.
+
+    >>> lookup = make_bridge_lookup([[1, 'A'], [2, 'B'], [2, 'C']])
+    >>> lookup(2)
+    [2, 'B']
+    >>> lookup(42)
+    []
+    """
+
+    if isinstance(bridge_data, BridgeStore):
+        return bridge_data.get
+
+    records = {}
+    for bridge in bridge_data:
+        records.setdefault(bridge[ID_INDEX], bridge)
+    return lambda bridge_id: records.get(bridge_id, [])
@@ -0,0 +1,134 @@
+"""Detection of bridges at the same or nearly the same location.
+
+Many structures in the inventory are recorded with almost identical
+coordinates, such as pairs of underpasses carrying the two directions of a
+highway. find_close_pairs finds every pair of bridges within a given
+distance of each other without comparing every bridge with every other:
+it puts the bridges into a grid of cells at least as large as the
+distance, in both directions, and compares each bridge only with those in
+its own cell and the cells around it. Distances are computed exactly as
+get_distance_between computes them, so the pairs are those a scan over all
+pairs would find.
+
+find_colocated groups the pairs into clusters of bridges joined by chains
+of close pairs, for review.
+"""
+
+from math import cos, radians
+
+from constants import ID_INDEX, NAME_INDEX, LAT_INDEX, LON_INDEX
+from distance_service import bounding_box, haversine
+
+
+DEFAULT_TOLERANCE = 0.05
+
+
+def _grid(bridge_data: list[list], tolerance: float) -> tuple[float, float]:
+    """Return the height and width, in degrees, of grid cells such that
+    every bridge within tolerance km of a bridge in bridge_data is in the
+    same cell or a neighbouring one. The width is 360 if no cell narrower
+    than every longitude will do.
+    """
+
+    height, width = 0.0, 0.0
+    for bridge in bridge_data:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(
+            bridge[LAT_INDEX], bridge[LON_INDEX], tolerance)
+        height = max(height, (max_lat - min_lat) / 2)
+        width = max(width, (max_lon - min_lon) / 2)
+    return height or 1.0, min(width, 360.0) or 1.0
+
+
+def _close_positions(bridge_data: list[list],
+                     tolerance: float) -> list[tuple[int, int, float]]:
+    """Return a list of (pos1, pos2, distance) for every pair of positions
+    pos1 < pos2 of bridges in bridge_data at most tolerance km apart, in
+    increasing order.
+    """
+
+    height, width = _grid(bridge_data, tolerance)
+    points = [(radians(bridge[LAT_INDEX]), radians(bridge[LON_INDEX]),
+               cos(radians(bridge[LAT_INDEX]))) for bridge in bridge_data]
+    cells = {}
+    for pos, bridge in enumerate(bridge_data):
+        cell = (int(bridge[LAT_INDEX] // height),
+                int(bridge[LON_INDEX] // width) if width < 360 else 0)
+        cells.setdefault(cell, []).append(pos)
+
+    column_steps = (-1, 0, 1) if width < 360 else (0,)
+    pairs = []
+    for (row, column), positions in cells.items():
+        neighbours = []
+        for row_step in (-1, 0, 1):
+            for column_step in column_steps:
+                neighbours.extend(cells.get((row + row_step,
+                                             column + column_step), []))
+        for pos1 in positions:
+            for pos2 in neighbours:
+                if pos1 < pos2:
+                    distance = haversine(*points[pos1], *points[pos2])
+                    if distance <= tolerance:
+                        pairs.append((pos1, pos2, distance))
+    pairs.sort()
+    return pairs
+
+
+def find_close_pairs(bridge_data: list[list],
+                     tolerance: float = DEFAULT_TOLERANCE
+                     ) -> list[tuple[int, int, float]]:
+    """Return a list of (id1, id2, distance) for every pair of bridges in
+    bridge_data at most tolerance km apart, as get_distance_between
+    measures it, where the bridge with ID id1 comes before the bridge with
+    ID id2. The pairs are in the order of their first and then their second
+    bridge.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> find_close_pairs(THREE_BRIDGES, 2)
+    [(1, 2, 1.968)]
+    >>> find_close_pairs(THREE_BRIDGES, 1.967)
+    []
+    """
+
+    return [(bridge_data[pos1][ID_INDEX], bridge_data[pos2][ID_INDEX],
+             distance)
+            for (pos1, pos2, distance)
+            in _close_positions(bridge_data, tolerance)]
+
+
+def find_colocated(bridge_data: list[list],
+                   tolerance: float = DEFAULT_TOLERANCE
+                   ) -> list[list[tuple[int, str]]]:
+    """Return the clusters of bridges in bridge_data joined by chains of
+    bridges at most tolerance km apart, each as a list of the (ID, name)
+    of its bridges in the order of bridge_data. Bridges close to no other
+    bridge are left out. The clusters are in the order of their first
+    bridges.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> clusters = find_colocated(THREE_BRIDGES, 2)
+    >>> len(clusters), clusters[0][1]
+    (1, (2, 'WEST STREET UNDERPASS'))
+    >>> find_colocated(THREE_BRIDGES, 300)[0][2]
+    (3, 'STOKES RIVER BRIDGE')
+    """
+
+    parents = list(range(len(bridge_data)))
+
+    def find(pos: int) -> int:
+        """Return the first position in the cluster of position pos."""
+
+        while parents[pos] != pos:
+            parents[pos] = parents[parents[pos]]
+            pos = parents[pos]
+        return pos
+
+    for (pos1, pos2, _) in _close_positions(bridge_data, tolerance):
+        root1, root2 = find(pos1), find(pos2)
+        if root1 != root2:
+            parents[max(root1, root2)] = min(root1, root2)
+
+    clusters = {}
+    for pos in range(len(bridge_data)):
+        clusters.setdefault(find(pos), []).append(
+            (bridge_data[pos][ID_INDEX], bridge_data[pos][NAME_INDEX]))
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
@@ -0,0 +1,210 @@
+"""A columnar (struct-of-arrays) form of formatted bridge data.
+
+Instead of one list per bridge, BridgeColumns keeps one column per field:
+contiguous float64 arrays for locations and lengths, integer arrays for
+IDs and span counts, and the spans and BCIs of all bridges in two flat
+float64 arrays, with an array of offsets giving where each bridge's values
+start. Text fields are kept in lists.
+
+A BridgeColumns is a read-only sequence of bridge records, so it can be
+passed to every query function in bridge_functions.py. Its records are
+views that read their fields from the columns when they are indexed with
+the constants in constants.py.
+"""
+
+from array import array
+from typing import Iterator, Union
+
+from constants import (
+    ID_INDEX, NAME_INDEX, HIGHWAY_INDEX, LAT_INDEX, LON_INDEX, YEAR_INDEX,
+    LAST_MAJOR_INDEX, LAST_MINOR_INDEX, NUM_SPANS_INDEX, SPAN_DETAILS_INDEX,
+    LENGTH_INDEX, LAST_INSPECTED_INDEX, BCIS_INDEX)
+
+
+# The number of fields in a formatted bridge record.
+NUM_FIELDS = BCIS_INDEX + 1
+
+# The names of the columns holding one value per bridge, by field index.
+SCALAR_COLUMNS = {
+    ID_INDEX: 'ids', NAME_INDEX: 'names', HIGHWAY_INDEX: 'highways',
+    LAT_INDEX: 'lats', LON_INDEX: 'lons', YEAR_INDEX: 'years',
+    LAST_MAJOR_INDEX: 'last_majors', LAST_MINOR_INDEX: 'last_minors',
+    NUM_SPANS_INDEX: 'num_spans', LENGTH_INDEX: 'lengths',
+    LAST_INSPECTED_INDEX: 'last_inspected'}
+
+
+class BridgeColumns:
+    """Formatted bridge data stored column by column.
+
+    >>> columns = to_columns([
+    ...     [1, 'WEST STREET UNDERPASS', '403', 43.164531, -80.251582,
+    ...      '1963', '2014', '2007', 4, [12.2, 18.0, 18.0, 12.2], 61.0,
+    ...      '04/13/2012', [71.5, 68.1, 69.0]],
+    ...     [2, 'STOKES RIVER BRIDGE', '6', 45.036739, -81.33579, '1958',
+    ...      '2013', '', 1, [16.0], 18.4, '08/28/2013', []]])
+    >>> len(columns)
+    2
+    >>> columns[1][NAME_INDEX]
+    'STOKES RIVER BRIDGE'
+    >>> columns[0][SPAN_DETAILS_INDEX]
+    [12.2, 18.0, 18.0, 12.2]
+    >>> list(columns.span_offsets)
+    [0, 4, 5]
+    >>> columns[0] == [1, 'WEST STREET UNDERPASS', '403', 43.164531,
+    ...                -80.251582, '1963', '2014', '2007', 4,
+    ...                [12.2, 18.0, 18.0, 12.2], 61.0, '04/13/2012',
+    ...                [71.5, 68.1, 69.0]]
+    True
+    """
+
+    def __init__(self) -> None:
+        """Initialize new, empty columns."""
+
+        # As for a BridgeStore: the number of changes to the columns, and
+        # the indexes attached to them with the versions they describe.
+        self.version = 0
+        self.indexes = {}
+        self.ids = array('q')
+        self.names = []
+        self.highways = []
+        self.lats = array('d')
+        self.lons = array('d')
+        self.years = []
+        self.last_majors = []
+        self.last_minors = []
+        self.num_spans = array('q')
+        self.span_offsets = array('q', [0])
+        self.spans = array('d')
+        self.lengths = array('d')
+        self.last_inspected = []
+        self.bci_offsets = array('q', [0])
+        self.bcis = array('d')
+
+    def append(self, record: list) -> None:
+        """Add the formatted bridge record record to the end of these
+        columns.
+        """
+
+        self.ids.append(record[ID_INDEX])
+        self.names.append(record[NAME_INDEX])
+        self.highways.append(record[HIGHWAY_INDEX])
+        self.lats.append(record[LAT_INDEX])
+        self.lons.append(record[LON_INDEX])
+        self.years.append(record[YEAR_INDEX])
+        self.last_majors.append(record[LAST_MAJOR_INDEX])
+        self.last_minors.append(record[LAST_MINOR_INDEX])
+        self.num_spans.append(record[NUM_SPANS_INDEX])
+        self.spans.extend(record[SPAN_DETAILS_INDEX])
+        self.span_offsets.append(len(self.spans))
+        self.lengths.append(record[LENGTH_INDEX])
+        self.last_inspected.append(record[LAST_INSPECTED_INDEX])
+        self.bcis.extend(record[BCIS_INDEX])
+        self.bci_offsets.append(len(self.bcis))
+        self.version += 1
+
+    def field(self, pos: int, field_index: int) -> object:
+        """Return the field at index field_index of the bridge at position
+        pos.
+        """
+
+        if field_index == SPAN_DETAILS_INDEX:
+            return self.spans[self.span_offsets[pos]:
+                              self.span_offsets[pos + 1]].tolist()
+        if field_index == BCIS_INDEX:
+            return self.bcis[self.bci_offsets[pos]:
+                             self.bci_offsets[pos + 1]].tolist()
+        return getattr(self, SCALAR_COLUMNS[field_index])[pos]
+
+    def record(self, pos: int) -> list:
+        """Return a new list with the fields of the bridge at position pos,
+        in the layout produced by format_data.
+        """
+
+        return [self.field(pos, field_index)
+                for field_index in range(NUM_FIELDS)]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, key: Union[int, slice]
+                    ) -> Union['BridgeRow', list['BridgeRow']]:
+        if isinstance(key, slice):
+            return [BridgeRow(self, pos)
+                    for pos in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('BridgeColumns index out of range')
+        return BridgeRow(self, key)
+
+    def __iter__(self) -> Iterator['BridgeRow']:
+        for pos in range(len(self)):
+            yield BridgeRow(self, pos)
+
+
+class BridgeRow:
+    """A read-only view of one bridge in a BridgeColumns, indexed like a
+    formatted bridge record.
+
+    >>> columns = to_columns([[1, 'A', '1', 43.0, -80.0, '1960', '', '', 1,
+    ...                        [10.0], 10.0, '01/01/2013', [70.0]]])
+    >>> row = columns[0]
+    >>> row[LAT_INDEX], row[BCIS_INDEX]
+    (43.0, [70.0])
+    >>> len(row)
+    13
+    """
+
+    __slots__ = ('_columns', '_pos')
+
+    def __init__(self, columns: BridgeColumns, pos: int) -> None:
+        """Initialize a view of the bridge at position pos in columns."""
+
+        self._columns = columns
+        self._pos = pos
+
+    def __getitem__(self, field_index: int) -> object:
+        if field_index < 0:
+            field_index += NUM_FIELDS
+        return self._columns.field(self._pos, field_index)
+
+    def __len__(self) -> int:
+        return NUM_FIELDS
+
+    def __iter__(self) -> Iterator[object]:
+        for field_index in range(NUM_FIELDS):
+            yield self._columns.field(self._pos, field_index)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, BridgeRow):
+            other = list(other)
+        return list(self) == other
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def to_columns(bridge_data: list[list]) -> BridgeColumns:
+    """Return the formatted bridge data bridge_data in columnar form.
+
+    >>> to_columns([]).ids
+    array('q')
+    """
+
+    columns = BridgeColumns()
+    for record in bridge_data:
+        columns.append(record)
+    return columns
+
+
+def to_records(columns: BridgeColumns) -> list[list]:
+    """Return the bridge data in columns as a list of formatted bridge
+    records, the inverse of to_columns.
+
+    >>> records = [[1, 'A', '1', 43.0, -80.0, '1960', '', '', 2,
+    ...             [10.0, 5.5], 15.5, '01/01/2013', [70.0, 68.2]]]
+    >>> to_records(to_columns(records)) == records
+    True
+    """
+
+    return [columns.record(pos) for pos in range(len(columns))]
@@ -0,0 +1,296 @@
+"""A bridge inventory that many threads can query and update at once.
+
+inspect_bridges and add_rehab modify bridge records in place, so threads
+that update the same bridge at the same time can lose updates, and a thread
+that adds or removes bridges can break the queries of every other thread.
+A ConcurrentInventory guards its bridge data with two kinds of locks:
+
+- a reader-writer lock over the list as a whole. Queries and updates of
+  existing records share it; only changes to the list itself, such as
+  adding bridges, take it exclusively.
+- a fixed number of record locks, each guarding the bridges whose IDs hash
+  to it. An update holds the locks of the bridges it changes, always taken
+  in the same order, so updates of different bridges run at the same time
+  and no other update sees a batch of updates half applied.
+
+A batch is checked before any of it is applied, and if applying it fails
+anyway, the bridges it changed are put back as they were, so a batch is
+applied as a whole or not at all.
+
+Attached indexes are told about changed records one at a time.
+"""
+
+import threading
+from contextlib import contextmanager
+from copy import deepcopy
+from typing import Any, Callable, Iterable, Iterator
+
+import bridge_functions as bf
+from bridge_store import BridgeStore
+from index_registry import record_changed
+
+
+NUM_STRIPES = 64
+
+
+class ReadWriteLock:
+    """A lock that many readers can hold at once, or a single writer.
+    Waiting writers go first, so a stream of readers cannot starve them.
+
+    >>> lock = ReadWriteLock()
+    >>> with lock.reading():
+    ...     with lock.reading():
+    ...         lock.readers
+    2
+    >>> with lock.writing():
+    ...     lock.writer
+    True
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new lock that nobody holds."""
+
+        self._condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        """Wait until there is no writer, and hold the lock as a reader."""
+
+        with self._condition:
+            while self.writer or self._waiting_writers:
+                self._condition.wait()
+            self.readers += 1
+
+    def release_read(self) -> None:
+        """Stop holding the lock as a reader."""
+
+        with self._condition:
+            self.readers -= 1
+            if not self.readers:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """Wait until nobody holds the lock, and hold it as the writer."""
+
+        with self._condition:
+            self._waiting_writers += 1
+            while self.writer or self.readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self.writer = True
+
+    def release_write(self) -> None:
+        """Stop holding the lock as the writer."""
+
+        with self._condition:
+            self.writer = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        """Hold the lock as a reader for the duration of a with statement.
+        """
+
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """Hold the lock as the writer for the duration of a with statement.
+        """
+
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentInventory:
+    """Formatted bridge data shared between threads.
+
+    >>> inventory = ConcurrentInventory(deepcopy(bf.THREE_BRIDGES))
+    >>> inventory.apply_batch(inspections=[(1, '10/18/2026', 68.0),
+    ...                                    (3, '10/18/2026', 55.0)],
+    ...                       rehabs=[(2, '10/18/2026', True)])
+    >>> inventory.query(bf.get_bridges_with_bci_below, [1, 2, 3], 70)
+    [1, 3]
+    >>> inventory.get_bridge(2)[6]
+    '2026'
+    """
+
+    def __init__(self, bridge_data: list[list],
+                 num_stripes: int = NUM_STRIPES) -> None:
+        """Initialize the inventory with the formatted bridge data
+        bridge_data, which must not be used directly while the inventory is
+        in use.
+        """
+
+        self._data = (bridge_data if isinstance(bridge_data, BridgeStore)
+                      else BridgeStore(bridge_data))
+        self._data.reindex()
+        self._lock = ReadWriteLock()
+        self._stripes = [threading.Lock() for _ in range(num_stripes)]
+        self._index_lock = threading.Lock()
+
+    def _stripes_for(self, bridge_ids: Iterable[int]) -> list[threading.Lock]:
+        """Return the record locks of the bridges with IDs in bridge_ids, in
+        the order they must be taken.
+        """
+
+        numbers = {hash(bridge_id) % len(self._stripes)
+                   for bridge_id in bridge_ids}
+        return [self._stripes[number] for number in sorted(numbers)]
+
+    @contextmanager
+    def _updating(self, bridge_ids: Iterable[int]) -> Iterator[None]:
+        """Hold the locks needed to update the bridges with IDs in
+        bridge_ids for the duration of a with statement.
+        """
+
+        stripes = self._stripes_for(bridge_ids)
+        with self._lock.reading():
+            for stripe in stripes:
+                stripe.acquire()
+            try:
+                yield
+            finally:
+                for stripe in reversed(stripes):
+                    stripe.release()
+
+    def _update(self, bridge_id: int, function: Callable,
+                *args: Any) -> None:
+        """Apply the bridge_functions mutator function, with arguments args
+        after the bridge data, to the bridge with ID bridge_id, and tell the
+        attached indexes. The bridge's record lock must be held.
+        """
+
+        bridge = self._data.get(bridge_id)
+        if bridge:
+            function([bridge], *args)
+            with self._index_lock:
+                record_changed(self._data, bridge)
+
+    def _restore(self, saved: dict[int, list]) -> None:
+        """Put back the fields of each bridge whose ID is a key of saved to
+        the values saved for it, and tell the attached indexes. The
+        bridges' record locks must be held.
+        """
+
+        for bridge_id, fields in saved.items():
+            bridge = self._data.get(bridge_id)
+            for field_index, value in enumerate(fields):
+                bridge[field_index] = value
+            with self._index_lock:
+                record_changed(self._data, bridge)
+
+    def inspect_bridges(self, bridge_ids: list[int], date: str,
+                        bci: float) -> None:
+        """Apply inspect_bridges(bridge_data, bridge_ids, date, bci) as a
+        single atomic update.
+        """
+
+        self.apply_batch(inspections=[(bridge_id, date, bci)
+                                      for bridge_id in bridge_ids])
+
+    def add_rehab(self, bridge_id: int, date: str, is_major: bool) -> None:
+        """Apply add_rehab(bridge_data, bridge_id, date, is_major)."""
+
+        self.apply_batch(rehabs=[(bridge_id, date, is_major)])
+
+    def apply_batch(self,
+                    inspections: Iterable[tuple[int, str, float]] = (),
+                    rehabs: Iterable[tuple[int, str, bool]] = ()) -> None:
+        """Apply each inspection (bridge_id, date, bci) in inspections and
+        then each rehab (bridge_id, date, is_major) in rehabs, in order, as
+        one atomic update: no other update or consistent read sees some of
+        them without the others. Raise TypeError, and apply none of them, if
+        a date is not a string or a BCI is not a number; if applying them
+        fails, put the bridges back as they were before raising the error.
+
+        >>> inventory = ConcurrentInventory(deepcopy(bf.THREE_BRIDGES))
+        >>> inventory.apply_batch(inspections=[(1, '10/18/2026', 68.0),
+        ...                                    (3, '10/18/2026', '55')])
+        Traceback (most recent call last):
+        TypeError: BCI scores must be numbers, not str
+        >>> inventory.get_bridge(1) == bf.THREE_BRIDGES[0]
+        True
+        """
+
+        inspections, rehabs = list(inspections), list(rehabs)
+        for (_, _, bci) in inspections:
+            if not isinstance(bci, (int, float)):
+                raise TypeError('BCI scores must be numbers, not '
+                                f'{type(bci).__name__}')
+        for (_, date, _) in inspections + rehabs:
+            if not isinstance(date, str):
+                raise TypeError('dates must be strings, not '
+                                f'{type(date).__name__}')
+        bridge_ids = ([inspection[0] for inspection in inspections]
+                      + [rehab[0] for rehab in rehabs])
+        with self._updating(bridge_ids):
+            saved = {}
+            for bridge_id in bridge_ids:
+                bridge = self._data.get(bridge_id)
+                if bridge and bridge_id not in saved:
+                    saved[bridge_id] = deepcopy(list(bridge))
+            try:
+                for (bridge_id, date, bci) in inspections:
+                    self._update(bridge_id, bf.inspect_bridges, [bridge_id],
+                                 date, bci)
+                for (bridge_id, date, is_major) in rehabs:
+                    self._update(bridge_id, bf.add_rehab, bridge_id, date,
+                                 is_major)
+            except BaseException:
+                self._restore(saved)
+                raise
+
+    def get_bridge(self, bridge_id: int) -> list:
+        """Return a copy of the bridge with ID bridge_id as it is between
+        updates, or [] if there is no such bridge.
+        """
+
+        with self._updating([bridge_id]):
+            return deepcopy(self._data.get(bridge_id))
+
+    def query(self, function: Callable, *args: Any) -> Any:
+        """Return function(bridge_data, *args), for a bridge_functions query
+        function. Updates of other bridges may run at the same time, so a
+        query over many bridges may see some of a concurrent batch of
+        updates; use consistent_query to avoid that.
+        """
+
+        with self._lock.reading():
+            return function(self._data, *args)
+
+    def consistent_query(self, function: Callable, *args: Any) -> Any:
+        """Return function(bridge_data, *args) while no update runs."""
+
+        with self._updating(range(len(self._stripes))):
+            return function(self._data, *args)
+
+    @contextmanager
+    def exclusive(self) -> Iterator[BridgeStore]:
+        """Give the bridge data, for the duration of a with statement, to
+        code that may change the list itself, while no other thread uses it.
+
+        >>> inventory = ConcurrentInventory([])
+        >>> with inventory.exclusive() as bridge_data:
+        ...     bridge_data.append(deepcopy(bf.THREE_BRIDGES[0]))
+        >>> inventory.query(bf.get_total_length_on_hwy, '403')
+        65.0
+        """
+
+        with self._lock.writing():
+            yield self._data
+
+    def __len__(self) -> int:
+        """Return the number of bridges in this inventory."""
+
+        with self._lock.reading():
+            return len(self._data)
@@ -0,0 +1,204 @@
+"""Haversine distances computed for many locations at once with NumPy.
+
+The distances agree exactly with calculate_distance in bridge_functions.py:
+each value is rounded to the nearest meter the way round(distance, 3) does,
+and the few values that lie so close to a rounding boundary that NumPy's
+trigonometry could land them on the other side are recomputed with
+calculate_distance itself.
+
+NumPy is optional. Without it this module can still be imported, but
+build_coordinate_arrays raises ImportError, so the functions in
+bridge_functions.py never take their array-backed paths.
+"""
+
+from typing import Optional
+
+from columnar import BridgeColumns
+from constants import ID_INDEX, LAT_INDEX, LON_INDEX, EARTH_RADIUS
+from index_registry import attach_index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# A distance whose value in meters is within BOUNDARY_TOLERANCE of a half
+# meter is recomputed with calculate_distance before rounding.
+BOUNDARY_TOLERANCE = 1e-6
+
+
+def batch_distances(lat, lon, lats, lons, rounded: bool = True):
+    """Return a NumPy array of the distances in kilometers between the
+    locations (lat, lon) and (lats, lons). The arguments may be numbers or
+    arrays of any shapes that broadcast together, so one point can be
+    compared with many, or many points with as many others.
+
+    If rounded is True, every distance is exactly the value
+    calculate_distance returns for the same two locations.
+
+    >>> batch_distances(43.167233, -80.275567, [43.164531, 45.036739],
+    ...                 [-80.251582, -81.33579]).tolist()
+    [1.968, 224.451]
+    >>> batch_distances([43.42], [-79.24], 53.32, -113.30).tolist()
+    [2713.226]
+    """
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *[np.radians(np.atleast_1d(np.asarray(value, dtype=np.float64)))
+          for value in (lat, lon, lats, lons)])
+
+    haversine = (np.sin((lat2 - lat1) / 2) ** 2
+                 + np.cos(lat1) * np.cos(lat2)
+                 * np.sin((lon2 - lon1) / 2) ** 2)
+    distances = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(haversine))
+    if rounded:
+        distances = _round_to_meters(distances, lat, lon, lats, lons)
+    return distances
+
+
+def pairwise_distances(lats1, lons1, lats2, lons2, rounded: bool = True):
+    """Return a NumPy array with one row for each location (lats1[i],
+    lons1[i]) and one column for each location (lats2[j], lons2[j]),
+    holding the distance in kilometers between the two.
+
+    >>> pairwise_distances([43.167233, 45.036739], [-80.275567, -81.33579],
+    ...                    [43.164531], [-80.251582]).tolist()
+    [[1.968], [225.459]]
+    """
+
+    return batch_distances(np.asarray(lats1, dtype=np.float64)[:, None],
+                           np.asarray(lons1, dtype=np.float64)[:, None],
+                           lats2, lons2, rounded)
+
+
+def _round_to_meters(distances, lat, lon, lats, lons):
+    """Return distances rounded to the nearest meter exactly the way
+    calculate_distance rounds, where distances[i] is the unrounded distance
+    between (lat, lon) and (lats, lons), broadcast together.
+    """
+
+    meters = distances * 1000
+    rounded = np.rint(meters) / 1000
+    borderline = np.abs(meters - np.floor(meters) - 0.5) < BOUNDARY_TOLERANCE
+    if borderline.any():
+        # Imported here: bridge_functions imports this module.
+        from bridge_functions import calculate_distance
+
+        coords = np.broadcast_arrays(
+            *[np.atleast_1d(np.asarray(value, dtype=np.float64))
+              for value in (lat, lon, lats, lons)])
+        for where in zip(*np.nonzero(borderline)):
+            rounded[where] = calculate_distance(
+                *[float(coord[where]) for coord in coords])
+    return rounded
+
+
+class CoordinateArrays:
+    """The latitudes, longitudes and IDs of the bridges in bridge data, as
+    NumPy arrays.
+
+    The distances from the most recent query location are kept, so that
+    several radius queries around one location compute them only once.
+
+    >>> arrays = CoordinateArrays([[1, 'A', '1', 43.167233, -80.275567],
+    ...                            [2, 'B', '1', 43.164531, -80.251582],
+    ...                            [3, 'C', '6', 45.036739, -81.33579]])
+    >>> arrays.positions_within(43.167233, -80.275567, 1.968)
+    [0, 1]
+    >>> arrays.closest_position(43.167233, -80.275567, 1)
+    1
+    >>> from columnar import to_columns
+    >>> columns = to_columns([[1, 'A', '1', 43.0, -80.0, '', '', '', 0, [],
+    ...                        0, '', []]])
+    >>> arrays = CoordinateArrays(columns)
+    >>> columns.append([2, 'B', '1', 44.0, -81.0, '', '', '', 0, [], 0, '',
+    ...                 []])
+    >>> len(columns), arrays.size
+    (2, 1)
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize new arrays for the bridges in bridge data
+        bridge_data.
+        """
+
+        if np is None:
+            raise ImportError('CoordinateArrays requires NumPy')
+        self.size = len(bridge_data)
+        if isinstance(bridge_data, BridgeColumns):
+            # Share the read-only buffers of columns loaded from a snapshot.
+            # Growable arrays are copied, since an array that exports its
+            # buffer cannot be appended to.
+            share = isinstance(bridge_data.lats, memoryview)
+            convert = np.asarray if share else np.array
+            self.lats = convert(bridge_data.lats, dtype=np.float64)
+            self.lons = convert(bridge_data.lons, dtype=np.float64)
+            self.ids = convert(bridge_data.ids)
+        else:
+            self.lats = np.array([bridge[LAT_INDEX]
+                                  for bridge in bridge_data],
+                                 dtype=np.float64)
+            self.lons = np.array([bridge[LON_INDEX]
+                                  for bridge in bridge_data],
+                                 dtype=np.float64)
+            self.ids = np.array([bridge[ID_INDEX] for bridge in bridge_data])
+        self._last_query = None
+
+    def record_changed(self, bridge: list) -> None:
+        """Do nothing: the functions that modify bridges in place do not
+        move them, and an IncrementalLoader detaches this index when a
+        load does.
+        """
+
+    def distances(self, lat: float, lon: float):
+        """Return an array of the distances from location (lat, lon) to
+        every bridge, as calculate_distance computes them.
+        """
+
+        last_query = self._last_query
+        if last_query is not None and last_query[:2] == (lat, lon):
+            return last_query[2]
+        distances = batch_distances(lat, lon, self.lats, self.lons)
+        self._last_query = (lat, lon, distances)
+        return distances
+
+    def positions_within(self, lat: float, lon: float,
+                         radius: float) -> list[int]:
+        """Return the positions of the bridges within radius kilometers of
+        location (lat, lon), in increasing order.
+        """
+
+        return np.flatnonzero(self.distances(lat, lon) <= radius).tolist()
+
+    def closest_position(self, lat: float, lon: float,
+                         bridge_id: Optional[int] = None) -> int:
+        """Return the position of the first bridge nearest to location
+        (lat, lon), ignoring bridges with ID bridge_id. Return -1 if every
+        bridge is ignored.
+        """
+
+        distances = self.distances(lat, lon)
+        if bridge_id is not None:
+            distances = np.where(self.ids == bridge_id, np.inf, distances)
+        if distances.size == 0:
+            return -1
+        pos = int(np.argmin(distances))
+        return pos if distances[pos] != np.inf else -1
+
+
+def build_coordinate_arrays(bridge_data: list[list]) -> CoordinateArrays:
+    """Build coordinate arrays for bridge data bridge_data, a BridgeStore or
+    a BridgeColumns, attach them to bridge_data so that
+    get_bridges_in_radius, get_closest_bridge and assign_inspectors use
+    them, and return them. Raise ImportError if NumPy is not installed.
+
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0]])
+    >>> build_coordinate_arrays(bridges).size
+    1
+    """
+
+    arrays = CoordinateArrays(bridge_data)
+    attach_index(bridge_data, arrays)
+    return arrays
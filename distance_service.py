@@ -0,0 +1,230 @@
+"""Distances between bridges, memoized and with cached trigonometry.
+
+A DistanceService converts the location of every bridge to radians and
+computes the cosine of its latitude once. Distances between bridges, given
+by their IDs, are kept in a bounded least-recently-used memo, so the pairs
+that route tools and repeated assignment runs ask for again cost a
+dictionary lookup. Every distance is computed with the same operations as
+calculate_distance, so it is exactly what calculate_distance returns.
+
+Queries limited to a radius first reject the bridges outside a box of
+latitudes and longitudes that contains every point within the radius, and
+only compute the distances to the others.
+"""
+
+from functools import lru_cache
+from math import sin, cos, asin, sqrt, radians, degrees, pi
+
+from constants import ID_INDEX, LAT_INDEX, LON_INDEX, EARTH_RADIUS
+from index_registry import attach_index
+from spatial_index import SEARCH_MARGIN
+
+
+DEFAULT_MEMO_SIZE = 1 << 16
+
+
+def haversine(lat1: float, lon1: float, cos_lat1: float,
+              lat2: float, lon2: float, cos_lat2: float) -> float:
+    """Return the distance in kilometers, rounded to the nearest meter,
+    between the locations (lat1, lon1) and (lat2, lon2) in radians, where
+    cos_lat1 and cos_lat2 are the cosines of lat1 and lat2.
+
+    >>> lat1, lat2 = radians(43.659777), radians(43.657129)
+    >>> haversine(lat1, radians(-79.397383), cos(lat1),
+    ...           lat2, radians(-79.399439), cos(lat2))
+    0.338
+    """
+
+    haversine_value = (sin((lat2 - lat1) / 2) ** 2
+                       + cos_lat1 * cos_lat2 * sin((lon2 - lon1) / 2) ** 2)
+    return round(2 * EARTH_RADIUS * asin(sqrt(haversine_value)), 3)
+
+
+def bounding_box(lat: float, lon: float,
+                 radius: float) -> tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lon, max_lon), in degrees, of a box
+    that contains every location within radius km of (lat, lon), allowing
+    for distances being rounded to the nearest meter. If no longitude can be
+    ruled out, the box spans all longitudes.
+
+    >>> [round(value, 3) for value in bounding_box(43.0, -80.0, 10)]
+    [42.91, 43.09, -80.123, -79.877]
+    >>> bounding_box(89.99, 0.0, 10)[2:]
+    (-inf, inf)
+    """
+
+    angle = (radius + SEARCH_MARGIN) / EARTH_RADIUS
+    min_lat, max_lat = lat - degrees(angle), lat + degrees(angle)
+    lat_radians = radians(lat)
+    if angle >= pi / 2 - abs(lat_radians):
+        return (min_lat, max_lat, -float('inf'), float('inf'))
+    spread = degrees(asin(sin(angle) / cos(lat_radians)))
+    if lon - spread < -180 or lon + spread > 180:
+        return (min_lat, max_lat, -float('inf'), float('inf'))
+    return (min_lat, max_lat, lon - spread, lon + spread)
+
+
+class DistanceService:
+    """Memoized distances between the bridges in bridge data.
+
+    As elsewhere, a bridge ID refers to the first bridge with that ID.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> service = DistanceService(THREE_BRIDGES)
+    >>> service.distance(1, 2), service.distance(2, 1)
+    (1.968, 1.968)
+    >>> service.ids_in_radius(43.7, -79.4, 300)
+    [1, 2, 3]
+    >>> service.ids_in_radius(43.165, -80.26, 2)
+    [1, 2]
+    >>> service.closest(3)
+    1
+    >>> stats = service.stats()
+    >>> stats['hits'], stats['misses'], stats['rejected_by_box']
+    (1, 1, 1)
+    """
+
+    def __init__(self, bridge_data: list[list],
+                 memo_size: int = DEFAULT_MEMO_SIZE) -> None:
+        """Initialize a service for bridge data bridge_data that remembers
+        up to memo_size distances between bridges.
+        """
+
+        self.size = len(bridge_data)
+        self._ids = [bridge[ID_INDEX] for bridge in bridge_data]
+        self._degrees = [(bridge[LAT_INDEX], bridge[LON_INDEX])
+                         for bridge in bridge_data]
+        self._radians = [(radians(lat), radians(lon), cos(radians(lat)))
+                         for (lat, lon) in self._degrees]
+        self._positions = {}
+        for pos in range(self.size):
+            self._positions.setdefault(self._ids[pos], pos)
+        self._memo = lru_cache(maxsize=memo_size)(self._compute)
+        self.evaluations = 0
+        self.rejected_by_box = 0
+
+    def record_changed(self, bridge: list) -> None:
+        """Do nothing: the functions that modify bridges in place do not
+        move them, and an IncrementalLoader detaches this index when a
+        load does.
+        """
+
+    def _compute(self, pos1: int, pos2: int) -> float:
+        """Return the distance between the bridges at positions pos1 and
+        pos2.
+        """
+
+        self.evaluations += 1
+        return haversine(*self._radians[pos1], *self._radians[pos2])
+
+    def distance(self, bridge_id1: int, bridge_id2: int) -> float:
+        """Return the distance in kilometers between the bridges with IDs
+        bridge_id1 and bridge_id2, as get_distance_between returns it.
+        Raise KeyError if there is no bridge with one of the IDs.
+        """
+
+        pos1 = self._positions[bridge_id1]
+        pos2 = self._positions[bridge_id2]
+        return self._memo(min(pos1, pos2), max(pos1, pos2))
+
+    def distance_to(self, lat: float, lon: float, bridge_id: int) -> float:
+        """Return the distance in kilometers from location (lat, lon) to the
+        bridge with ID bridge_id. Raise KeyError if there is no such bridge.
+        """
+
+        return self.distance_to_position(lat, lon,
+                                         self._positions[bridge_id])
+
+    def distance_to_position(self, lat: float, lon: float, pos: int) -> float:
+        """Return the distance in kilometers from location (lat, lon) to the
+        bridge at position pos in the bridge data, as calculate_distance
+        returns it.
+
+        >>> from bridge_functions import THREE_BRIDGES
+        >>> DistanceService(THREE_BRIDGES).distance_to_position(
+        ...     43.10, -80.15, 1)
+        10.929
+        """
+
+        self.evaluations += 1
+        lat_radians = radians(lat)
+        return haversine(lat_radians, radians(lon), cos(lat_radians),
+                         *self._radians[pos])
+
+    def ids_in_radius(self, lat: float, lon: float,
+                      radius: float) -> list[int]:
+        """Return the IDs of the bridges within radius km of location (lat,
+        lon), in order, as get_bridges_in_radius returns them.
+        """
+
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+        lat_radians = radians(lat)
+        center = (lat_radians, radians(lon), cos(lat_radians))
+        ids = []
+        for pos in range(self.size):
+            bridge_lat, bridge_lon = self._degrees[pos]
+            if not (min_lat <= bridge_lat <= max_lat
+                    and min_lon <= bridge_lon <= max_lon):
+                self.rejected_by_box += 1
+            else:
+                self.evaluations += 1
+                if haversine(*center, *self._radians[pos]) <= radius:
+                    ids.append(self._ids[pos])
+        return ids
+
+    def closest(self, bridge_id: int) -> int:
+        """Return the ID of the bridge nearest to the bridge with ID
+        bridge_id, as get_closest_bridge returns it. Distances are computed
+        with the cached trigonometry but not memoized, so that one query
+        does not push every other pair out of the memo.
+        """
+
+        reference = self._radians[self._positions[bridge_id]]
+        closest_id, min_distance = -1, float('inf')
+        for pos in range(self.size):
+            if self._ids[pos] != bridge_id:
+                self.evaluations += 1
+                distance = haversine(*reference, *self._radians[pos])
+                if distance < min_distance:
+                    closest_id, min_distance = self._ids[pos], distance
+        return closest_id
+
+    def stats(self) -> dict:
+        """Return a dictionary with the hits, misses, current size and
+        maximum size of the memo, the number of distances computed, and the
+        number of bridges rejected by bounding boxes.
+        """
+
+        info = self._memo.cache_info()
+        return {'hits': info.hits, 'misses': info.misses,
+                'memo_size': info.currsize, 'memo_max_size': info.maxsize,
+                'evaluations': self.evaluations,
+                'rejected_by_box': self.rejected_by_box}
+
+    def clear(self) -> None:
+        """Forget the memoized distances and reset the statistics."""
+
+        self._memo.cache_clear()
+        self.evaluations = 0
+        self.rejected_by_box = 0
+
+
+def build_distance_service(bridge_data: list[list],
+                           memo_size: int = DEFAULT_MEMO_SIZE
+                           ) -> DistanceService:
+    """Build a distance service for the BridgeStore bridge_data, attach it to
+    bridge_data so that get_closest_bridge, get_bridges_in_radius and the
+    inspector assignments use its cached trigonometry, and return it.
+
+    >>> from index_registry import find_index
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0],
+    ...                        [2, 'B', '1', 43.1, -80.0]])
+    >>> service = build_distance_service(bridges)
+    >>> find_index(bridges, DistanceService).distance(1, 2)
+    11.119
+    """
+
+    service = DistanceService(bridge_data, memo_size)
+    attach_index(bridge_data, service)
+    return service
@@ -0,0 +1,177 @@
+"""Per-highway totals over formatted bridge data, kept up to date as
+bridges are inspected and rehabilitated.
+
+A HighwayAggregates is built in one pass over the data. Once it is
+attached to the data, get_total_length_on_hwy answers from it, and
+inspect_bridges and add_rehab update it through the index registry, so
+reports for one highway or for every highway do not scan the inventory.
+"""
+
+from typing import Optional
+
+from constants import HIGHWAY_INDEX, LENGTH_INDEX, NUM_SPANS_INDEX, BCIS_INDEX
+from index_registry import attach_index, find_index
+
+
+class HighwayTotals:
+    """The totals for the bridges on one highway."""
+
+    def __init__(self) -> None:
+        """Initialize totals for a highway with no bridges."""
+
+        self.total_length = 0.0
+        self.num_bridges = 0
+        self.num_spans = 0
+        self.bci_sum = 0.0
+        self.num_bcis = 0
+
+    def mean_bci(self) -> float:
+        """Return the mean current BCI of the bridges on the highway that
+        have one, or 0.0 if none does.
+        """
+
+        return self.bci_sum / self.num_bcis if self.num_bcis else 0.0
+
+    def as_dict(self) -> dict:
+        """Return these totals as a dictionary."""
+
+        return {'total_length': self.total_length,
+                'num_bridges': self.num_bridges,
+                'num_spans': self.num_spans,
+                'mean_bci': self.mean_bci()}
+
+
+def _contribution(bridge: list) -> tuple:
+    """Return what bridge adds to the totals of its highway: (highway,
+    length, number of spans, current BCI or None).
+    """
+
+    bcis = bridge[BCIS_INDEX]
+    return (bridge[HIGHWAY_INDEX], float(bridge[LENGTH_INDEX]),
+            bridge[NUM_SPANS_INDEX], bcis[0] if bcis else None)
+
+
+class HighwayAggregates:
+    """Totals of deck length, bridges, spans and current BCI for each
+    highway in bridge data.
+
+    Deck lengths are summed in the order of the bridge data, so a highway's
+    total length is exactly what get_total_length_on_hwy computes by
+    scanning.
+
+    >>> from bridge_functions import THREE_BRIDGES
+    >>> aggregates = HighwayAggregates(THREE_BRIDGES)
+    >>> aggregates.total_length('403')
+    126.0
+    >>> aggregates.summary('403') == {'total_length': 126.0,
+    ...     'num_bridges': 2, 'num_spans': 8, 'mean_bci': 71.9}
+    True
+    >>> aggregates.summary('404')['num_bridges']
+    0
+    >>> sorted(aggregates.all_summaries())
+    ['403', '6']
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize the totals for the bridges in bridge data
+        bridge_data.
+        """
+
+        self.size = len(bridge_data)
+        self._totals = {}
+        self._counted = {}
+        self.stale = False
+        for bridge in bridge_data:
+            self._add(bridge)
+
+    def _add(self, bridge: list) -> None:
+        """Add bridge to the totals of its highway."""
+
+        highway, length, num_spans, bci = _contribution(bridge)
+        if highway not in self._totals:
+            self._totals[highway] = HighwayTotals()
+        totals = self._totals[highway]
+        totals.total_length += length
+        totals.num_bridges += 1
+        totals.num_spans += num_spans
+        if bci is not None:
+            totals.bci_sum += bci
+            totals.num_bcis += 1
+        self._counted[id(bridge)] = (highway, length, num_spans, bci)
+
+    def record_changed(self, bridge: list) -> None:
+        """Update the totals after bridge was modified in place.
+
+        Only a change of current BCI is applied; the deck length totals
+        could not stay exact if a bridge changed its highway, length or
+        spans, so these totals are then marked stale instead.
+        """
+
+        counted = self._counted.get(id(bridge))
+        if counted is None:
+            return
+        contribution = _contribution(bridge)
+        if contribution[:3] != counted[:3]:
+            self.stale = True
+            return
+
+        totals = self._totals[counted[0]]
+        old_bci, new_bci = counted[3], contribution[3]
+        if old_bci is not None:
+            totals.bci_sum -= old_bci
+            totals.num_bcis -= 1
+        if new_bci is not None:
+            totals.bci_sum += new_bci
+            totals.num_bcis += 1
+        self._counted[id(bridge)] = contribution
+
+    def total_length(self, highway: str) -> float:
+        """Return the total deck length of the bridges on highway highway.
+        """
+
+        totals = self._totals.get(highway)
+        return totals.total_length if totals is not None else 0.0
+
+    def summary(self, highway: str) -> dict:
+        """Return a dictionary with the total_length, num_bridges,
+        num_spans and mean_bci of the bridges on highway highway.
+        """
+
+        return self._totals.get(highway, HighwayTotals()).as_dict()
+
+    def all_summaries(self) -> dict[str, dict]:
+        """Return a dictionary from each highway to its summary."""
+
+        return {highway: totals.as_dict()
+                for (highway, totals) in self._totals.items()}
+
+
+def build_highway_aggregates(bridge_data: list[list]) -> HighwayAggregates:
+    """Build per-highway totals for the BridgeStore bridge_data, attach them to
+    bridge_data so that get_total_length_on_hwy uses them and
+    inspect_bridges and add_rehab keep them up to date, and return them.
+
+    >>> from copy import deepcopy
+    >>> from bridge_functions import THREE_BRIDGES, inspect_bridges
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore(deepcopy(THREE_BRIDGES))
+    >>> aggregates = build_highway_aggregates(bridges)
+    >>> inspect_bridges(bridges, [3], '09/15/2018', 80.1)
+    >>> get_highway_summary(bridges, '6')['mean_bci']
+    80.1
+    """
+
+    aggregates = HighwayAggregates(bridge_data)
+    attach_index(bridge_data, aggregates)
+    return aggregates
+
+
+def get_highway_summary(bridge_data: list[list],
+                        highway: str) -> Optional[dict]:
+    """Return the summary of highway highway from the per-highway totals
+    attached to bridge_data, or None if none are attached or they are out
+    of date.
+    """
+
+    aggregates = find_index(bridge_data, HighwayAggregates)
+    return aggregates.summary(highway) if aggregates is not None else None
@@ -0,0 +1,234 @@
+"""Incremental loading of republished bridge CSV exports.
+
+Each new export of the bridge conditions data repeats most of the rows of
+the last one unchanged. An IncrementalLoader remembers a fingerprint of
+every raw row it has loaded: a structure key, which is the structure ID in
+the first column of the row together with the number of earlier rows with
+the same structure ID, and a hash of the row's contents. When a new export
+is loaded, only the rows that were added or whose contents changed are
+formatted; every other bridge keeps its formatted record.
+
+Bridge IDs are numbered from 1 in the order of the rows, as format_data
+numbers them, so a row added or removed in the middle of an export changes
+the IDs of the bridges after it. Each load returns a LoadDelta that tells,
+by bridge ID, which bridges were added, removed or changed and which were
+renumbered, so that indexes and aggregates over the data can be patched
+instead of rebuilt.
+"""
+
+import hashlib
+from typing import Iterable, TextIO
+
+from bridge_functions import format_record, iter_data
+from bridge_store import BridgeStore
+from constants import ID_INDEX, NAME_INDEX, LAT_INDEX, LON_INDEX
+from index_registry import detach_indexes, record_changed
+
+
+# Joins the values of a raw row before it is hashed.
+FIELD_SEPARATOR = '\x1f'
+DIGEST_SIZE = 16
+# The fields that indexes find bridges by position with. Indexes are not
+# told when these change, since the functions that modify bridges in place
+# never change them, so a load that changes one detaches every index.
+LOCATION_FIELDS = (NAME_INDEX, LAT_INDEX, LON_INDEX)
+
+
+def content_hash(row: list[str]) -> bytes:
+    """Return a hash of the values of the raw bridge record row.
+
+    >>> content_hash(['1 -  32/', 'A']) == content_hash(['1 -  32/', 'A'])
+    True
+    >>> content_hash(['1 -  32/', 'A']) == content_hash(['1 -  32/A', ''])
+    False
+    """
+
+    return hashlib.blake2b(FIELD_SEPARATOR.join(row).encode('utf-8'),
+                           digest_size=DIGEST_SIZE).digest()
+
+
+class LoadDelta:
+    """The differences between the bridges of two loads, by bridge ID.
+
+    added and changed hold the new IDs of the bridges whose rows were added
+    or whose contents changed, removed holds the old IDs of the bridges
+    whose rows are gone, and renumbered maps the old ID of every bridge in
+    both loads whose ID changed to its new ID. All are in increasing order.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a delta with no differences."""
+
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.renumbered = {}
+
+    def is_empty(self) -> bool:
+        """Return whether the two loads have the same bridges."""
+
+        return not (self.added or self.removed or self.changed
+                    or self.renumbered)
+
+    def as_dict(self) -> dict:
+        """Return this delta as a dictionary."""
+
+        return {'added': self.added, 'removed': self.removed,
+                'changed': self.changed, 'renumbered': self.renumbered}
+
+
+class IncrementalLoader:
+    """Formatted bridge data that follows successive exports of the raw
+    bridge data, formatting only the rows that are new or changed.
+
+    The records of the bridges kept from one load to the next are the same
+    objects, and so is bridge_data. When a load only changes the contents of
+    some rows, their records are reformatted in place and the indexes
+    attached to bridge_data are told with record_changed, so they stay
+    attached. When bridges are added, removed, renumbered, moved or
+    renamed, every index attached to bridge_data is detached, since the
+    spatial and name indexes cannot follow such changes; build them again
+    after such a load. Changes made to an unchanged bridge's record in
+    place, such as inspections, are kept until its row changes.
+
+    >>> rows = [['1 -  32/', 'A', '403', '43.1', '-80.2', '1965', '', '',
+    ...          '1', 'Total=12  (1)=12;', '12', '04/13/2012', '72.3', ''],
+    ...         ['2 -  43/', 'B', '403', '43.2', '-80.3', '1963', '', '',
+    ...          '1', 'Total=18  (1)=18;', '18', '04/13/2012', '71.5', '']]
+    >>> loader = IncrementalLoader()
+    >>> loader.load_rows([row[:] for row in rows]).added
+    [1, 2]
+    >>> record = loader.bridge_data.get(2)
+    >>> extra = ['0 -  17/', 'C', '6', '44.0', '-81.0', '1970', '', '', '0',
+    ...          '', '', '', '']
+    >>> new_rows = [extra[:]] + [row[:] for row in rows]
+    >>> new_rows[1][13] = '70.0'
+    >>> delta = loader.load_rows(new_rows)
+    >>> delta.as_dict() == {'added': [1], 'removed': [], 'changed': [2],
+    ...                     'renumbered': {1: 2, 2: 3}}
+    True
+    >>> loader.bridge_data.get(3) is record, loader.bridge_data.get(2)[12]
+    (True, [70.0])
+    >>> loader.formatted
+    2
+
+    >>> from highway_index import build_highway_aggregates, HighwayAggregates
+    >>> from index_registry import find_index
+    >>> aggregates = build_highway_aggregates(loader.bridge_data)
+    >>> newer_rows = [extra[:]] + [row[:] for row in rows]
+    >>> newer_rows[1][13] = '60.0'
+    >>> loader.load_rows(newer_rows).changed
+    [2]
+    >>> find_index(loader.bridge_data, HighwayAggregates) is aggregates
+    True
+    >>> aggregates.summary('403')['mean_bci']
+    60.0
+    >>> moved_rows = [extra[:]] + [row[:] for row in rows]
+    >>> moved_rows[1][1] = 'ZEBRA CROSSING'
+    >>> loader.load_rows(moved_rows).changed
+    [2]
+    >>> find_index(loader.bridge_data, HighwayAggregates) is None
+    True
+
+    A row that cannot be formatted leaves the bridges as they were:
+
+    >>> bad_rows = [row[:] for row in rows]
+    >>> bad_rows[1][3] = 'n/a'
+    >>> loader.load_rows(bad_rows)
+    Traceback (most recent call last):
+    ValueError: could not convert string to float: 'n/a'
+    >>> [bridge[1] for bridge in loader.bridge_data]
+    ['C', 'ZEBRA CROSSING', 'B']
+    >>> loader.load_rows([row[:] for row in rows]).renumbered
+    {2: 1, 3: 2}
+    """
+
+    def __init__(self) -> None:
+        """Initialize a loader that has loaded no rows."""
+
+        self.bridge_data = BridgeStore()
+        self.formatted = 0
+        # Maps the structure key of each row of the last load to the hash
+        # of its contents and its formatted record.
+        self._fingerprints = {}
+
+    def load_rows(self, rows: Iterable[list[str]]) -> LoadDelta:
+        """Replace the bridges with those in the raw rows rows, formatting
+        the rows that are new or changed, and return the differences with
+        the last load. The attached indexes are updated if the load only
+        changed rows without moving or renaming their bridges, and detached
+        otherwise.
+
+        Every row is formatted before any record is modified, so if a row
+        cannot be formatted, the error is raised and the bridges are left
+        as they were.
+        """
+
+        delta = LoadDelta()
+        fingerprints = {}
+        records = []
+        # The (record, bridge ID, formatted row or None) of each bridge
+        # kept from the last load, applied once every row is formatted.
+        updates = []
+        occurrences = {}
+        num_formatted = 0
+        for row in rows:
+            structure_id = row[ID_INDEX]
+            key = (structure_id, occurrences.get(structure_id, 0))
+            occurrences[structure_id] = key[1] + 1
+            digest = content_hash(row)
+            bridge_id = len(records) + 1
+
+            old = self._fingerprints.get(key)
+            if old is None:
+                format_record(row, bridge_id)
+                num_formatted += 1
+                record = row
+                delta.added.append(bridge_id)
+            else:
+                record = old[1]
+                if record[ID_INDEX] != bridge_id:
+                    delta.renumbered[record[ID_INDEX]] = bridge_id
+                if old[0] == digest:
+                    updates.append((record, bridge_id, None))
+                else:
+                    format_record(row, bridge_id)
+                    num_formatted += 1
+                    updates.append((record, bridge_id, row))
+                    delta.changed.append(bridge_id)
+            fingerprints[key] = (digest, record)
+            records.append(record)
+
+        for key, (_, record) in self._fingerprints.items():
+            if key not in fingerprints:
+                delta.removed.append(record[ID_INDEX])
+        delta.removed.sort()
+        delta.renumbered = {old_id: new_id for (old_id, new_id)
+                            in sorted(delta.renumbered.items())}
+
+        moved = False
+        for (record, bridge_id, row) in updates:
+            if row is None:
+                record[ID_INDEX] = bridge_id
+            else:
+                moved = moved or any(record[field] != row[field]
+                                     for field in LOCATION_FIELDS)
+                record[:] = row
+        self._fingerprints = fingerprints
+        self.formatted = num_formatted
+        if delta.added or delta.removed or delta.renumbered or moved:
+            detach_indexes(self.bridge_data)
+            self.bridge_data[:] = records
+            self.bridge_data.reindex()
+        else:
+            for bridge_id in delta.changed:
+                record_changed(self.bridge_data, records[bridge_id - 1])
+        return delta
+
+    def load(self, csv_file: TextIO) -> LoadDelta:
+        """Replace the bridges with those in the open CSV file csv_file,
+        read as read_data reads it, and return the differences with the
+        last load.
+        """
+
+        return self.load_rows(iter_data(csv_file))
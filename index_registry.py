@@ -0,0 +1,113 @@
+"""A registry of auxiliary indexes built over formatted bridge data.
+
+An index is attached to one BridgeStore, or BridgeColumns, and looked up
+by its type, so that the functions in bridge_functions.py can use an index
+transparently whenever one has been built for the store they are given.
+The store keeps its own indexes, so they are freed with it; a plain list
+of bridge records has no indexes.
+
+An index describes the store as it was when the index was attached. Every
+change to the list itself bumps the store's version (see BridgeStore), and
+an index attached at an earlier version is never returned by find_index,
+so callers fall back to scanning the data. Every index must have a method
+record_changed(bridge), which the functions that modify a bridge record in
+place call through record_changed below, so that the index can bring
+itself up to date. An index that cannot follow such a change sets its
+attribute stale to True, and is not returned by find_index either.
+"""
+
+from typing import Any, Optional
+
+from bridge_store import BridgeStore
+from columnar import BridgeColumns
+
+
+# The types of bridge data that indexes can be attached to.
+INDEXABLE_TYPES = (BridgeStore, BridgeColumns)
+
+
+def attach_index(bridge_data: list[list], index: Any) -> None:
+    """Attach index to the store bridge_data, replacing any index of the
+    same type that was attached to it before. Raise TypeError if
+    bridge_data is neither a BridgeStore nor a BridgeColumns.
+
+    >>> from spatial_index import SpatialIndex
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0]])
+    >>> attach_index(bridges, SpatialIndex(bridges))
+    >>> isinstance(find_index(bridges, SpatialIndex), SpatialIndex)
+    True
+    >>> attach_index(list(bridges), SpatialIndex(bridges))
+    Traceback (most recent call last):
+    TypeError: indexes can only be attached to a BridgeStore or BridgeColumns
+    """
+
+    if not isinstance(bridge_data, INDEXABLE_TYPES):
+        raise TypeError('indexes can only be attached to a BridgeStore or '
+                        'BridgeColumns')
+    bridge_data.indexes[type(index)] = (index, bridge_data.version)
+
+
+def find_index(bridge_data: list[list], index_type: type) -> Optional[Any]:
+    """Return the index of type index_type attached to bridge data
+    bridge_data. Return None if there is no such index, or if it is out of
+    date, in which case it is detached.
+
+    >>> from spatial_index import SpatialIndex
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0],
+    ...                        [2, 'B', '1', 44.0, -81.0]])
+    >>> find_index(bridges, SpatialIndex) is None
+    True
+    >>> attach_index(bridges, SpatialIndex(bridges))
+    >>> bridges.append(bridges.pop(0))
+    >>> find_index(bridges, SpatialIndex) is None
+    True
+    """
+
+    if not isinstance(bridge_data, INDEXABLE_TYPES):
+        return None
+    entry = bridge_data.indexes.get(index_type)
+    if entry is None:
+        return None
+    index, version = entry
+    if version != bridge_data.version or getattr(index, 'stale', False):
+        del bridge_data.indexes[index_type]
+        return None
+    return index
+
+
+def detach_indexes(bridge_data: list[list],
+                   index_type: Optional[type] = None) -> None:
+    """Detach the index of type index_type from bridge data bridge_data, or
+    all of its indexes if index_type is None.
+
+    >>> from spatial_index import SpatialIndex
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0]])
+    >>> attach_index(bridges, SpatialIndex(bridges))
+    >>> detach_indexes(bridges, SpatialIndex)
+    >>> find_index(bridges, SpatialIndex) is None
+    True
+    """
+
+    if not isinstance(bridge_data, INDEXABLE_TYPES):
+        return
+    if index_type is None:
+        bridge_data.indexes.clear()
+    else:
+        bridge_data.indexes.pop(index_type, None)
+
+
+def record_changed(bridge_data: list[list], bridge: list) -> None:
+    """Tell every up-to-date index attached to bridge data bridge_data that
+    the bridge record bridge in bridge_data has been modified in place.
+
+    >>> from spatial_index import build_spatial_index
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0]])
+    >>> index = build_spatial_index(bridges)
+    >>> record_changed(bridges, bridges[0])
+    """
+
+    if not isinstance(bridge_data, INDEXABLE_TYPES):
+        return
+    for index, version in list(bridge_data.indexes.values()):
+        if version == bridge_data.version:
+            index.record_changed(bridge)
@@ -0,0 +1,346 @@
+"""Opt-in instrumentation of the functions in bridge_functions.py.
+
+enable() replaces every public function of bridge_functions, wherever it is
+bound at module level, by a wrapper that counts its calls and the wall time
+they take, and attributes them to the outermost instrumented call they are
+made from: the operation. For each operation the profile records which
+functions it called and how many distances it computed: the calls of
+calculate_distance, and the distances computed by the haversine kernels
+that the indexes use instead (see DISTANCE_KERNELS).
+disable() puts the original functions back, so when instrumentation is
+off, calls cost exactly what they did before.
+
+With count_scans=True the profile also counts the bridge records scanned:
+the iterations of the for loops in bridge_functions.py that run over bridge
+data. These are counted with a trace function (see sys.settrace), which
+slows down the code being profiled a great deal, so the times of such a
+profile should not be compared with those of an ordinary one. Scans are
+only counted in the thread that called enable, and any trace function
+already set there, such as a debugger's or a coverage tool's, is put back
+by disable.
+
+Calls made in different threads are attributed to the operations in
+progress in their own threads.
+
+The time of a generator function such as iter_formatted is the time taken
+to create the generator, not to run it.
+"""
+
+import ast
+import inspect
+import json
+import sys
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Iterator, Optional, TextIO
+
+import bridge_functions
+
+
+# The names of the bridge data parameters whose for loops count as scans.
+SCANNED_NAMES = {'bridge_data', 'data'}
+# The operation that counts scans made outside any instrumented call.
+TOP_LEVEL = '(top level)'
+# The (module, name) of each function outside bridge_functions that
+# computes distances, whose distances count as distance evaluations. A
+# function that returns an array counts one evaluation per element.
+DISTANCE_KERNELS = [('distance_service', 'haversine'),
+                    ('distance_kernel', 'batch_distances')]
+
+
+class Profile:
+    """Counts and times of the calls to bridge_functions, overall and for
+    each operation.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty profile."""
+
+        self.functions = {}
+        self.operations = {}
+
+    def _operation(self, name: str) -> dict:
+        """Return the statistics of operation name, adding them if needed.
+        """
+
+        if name not in self.operations:
+            self.operations[name] = {'calls': 0, 'seconds': 0.0,
+                                     'distance_evaluations': 0,
+                                     'records_scanned': 0, 'inner_calls': {}}
+        return self.operations[name]
+
+    def record_call(self, name: str, seconds: float,
+                    operation: Optional[str]) -> None:
+        """Record a call of function name that took seconds seconds, made
+        from operation operation, or None if it was the operation itself.
+        """
+
+        if name not in self.functions:
+            self.functions[name] = {'calls': 0, 'seconds': 0.0}
+        self.functions[name]['calls'] += 1
+        self.functions[name]['seconds'] += seconds
+
+        stats = self._operation(operation or name)
+        if operation is None:
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+        else:
+            stats['inner_calls'][name] = stats['inner_calls'].get(name, 0) + 1
+        if name == 'calculate_distance':
+            stats['distance_evaluations'] += 1
+
+    def record_distances(self, operation: str, count: int) -> None:
+        """Record that operation computed count distances with a distance
+        kernel.
+        """
+
+        self._operation(operation)['distance_evaluations'] += count
+
+    def record_scan(self, operation: str) -> None:
+        """Record that operation scanned one bridge record."""
+
+        self._operation(operation)['records_scanned'] += 1
+
+    def report(self) -> dict:
+        """Return this profile as a dictionary that can be saved as JSON."""
+
+        return {'functions': self.functions, 'operations': self.operations}
+
+    def dump(self, output_file: TextIO) -> None:
+        """Write this profile to the open file output_file as JSON."""
+
+        json.dump(self.report(), output_file, indent=2)
+        output_file.write('\n')
+
+
+_PROFILE = Profile()
+# Holds, as its attribute stack, the names of the instrumented calls in
+# progress in each thread, outermost first.
+_CALLS = threading.local()
+# The trace function that was set when scan counting was enabled.
+_PREVIOUS_TRACE = None
+# Maps (module, name) to the original function bound to name in module.
+_ORIGINALS = {}
+# Maps the code object of each function with scanning loops to the line
+# numbers of the first statements of those loops' bodies.
+_SCAN_LINES = {}
+
+
+def _stack() -> list[str]:
+    """Return the names of the instrumented calls in progress in the
+    current thread, outermost first.
+    """
+
+    stack = getattr(_CALLS, 'stack', None)
+    if stack is None:
+        stack = _CALLS.stack = []
+    return stack
+
+
+def _instrument(name: str, function: Callable) -> Callable:
+    """Return a wrapper of function, called name, that records its calls in
+    the current profile.
+    """
+
+    @wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        stack = _stack()
+        stack.append(name)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = perf_counter() - start
+            stack.pop()
+            _PROFILE.record_call(name, seconds, stack[0] if stack else None)
+
+    return wrapper
+
+
+def _count_distances(function: Callable) -> Callable:
+    """Return a wrapper of the distance kernel function that records the
+    distances it computes in the current profile.
+    """
+
+    @wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        distances = function(*args, **kwargs)
+        stack = _stack()
+        _PROFILE.record_distances(stack[0] if stack else TOP_LEVEL,
+                                  int(getattr(distances, 'size', 1)))
+        return distances
+
+    return wrapper
+
+
+def _find_scan_lines() -> dict:
+    """Return a dictionary from the code object of each function in
+    bridge_functions with for loops over bridge data to the line numbers of
+    the first statements of the bodies of those loops.
+    """
+
+    scan_lines = {}
+    for function in _public_functions().values():
+        source, first_line = inspect.getsourcelines(function)
+        tree = ast.parse(''.join(source))
+        lines = {node.body[0].lineno + first_line - 1
+                 for node in ast.walk(tree)
+                 if isinstance(node, ast.For)
+                 and any(isinstance(name, ast.Name)
+                         and name.id in SCANNED_NAMES
+                         for name in ast.walk(node.iter))}
+        if lines:
+            scan_lines[function.__code__] = lines
+    return scan_lines
+
+
+def _trace_calls(frame, event: str, arg: Any) -> Optional[Callable]:
+    """Trace the lines of the calls of the functions with scanning loops.
+    """
+
+    lines = _SCAN_LINES.get(frame.f_code)
+    if lines is None:
+        return None
+
+    def trace_lines(frame, event: str, arg: Any) -> Callable:
+        if event == 'line' and frame.f_lineno in lines:
+            stack = _stack()
+            _PROFILE.record_scan(stack[0] if stack else TOP_LEVEL)
+        return trace_lines
+
+    return trace_lines
+
+
+def _public_functions() -> dict[str, Callable]:
+    """Return a dictionary from the name of each public function defined in
+    bridge_functions to the original function.
+    """
+
+    functions = {}
+    for name, value in vars(bridge_functions).items():
+        original = _ORIGINALS.get((bridge_functions.__name__, name), value)
+        if (not name.startswith('_') and inspect.isfunction(original)
+                and original.__module__ == bridge_functions.__name__):
+            functions[name] = original
+    return functions
+
+
+def is_enabled() -> bool:
+    """Return whether instrumentation is enabled."""
+
+    return bool(_ORIGINALS)
+
+
+def enable(count_scans: bool = False) -> Profile:
+    """Start instrumenting bridge_functions, counting scanned records too if
+    count_scans is True, and return the profile the calls are recorded in.
+    Calls keep being recorded in the same profile until reset() is called.
+
+    >>> profile = enable()
+    >>> bridge_functions.get_closest_bridge(bridge_functions.THREE_BRIDGES, 2)
+    1
+    >>> disable()
+    >>> operation = profile.operations['get_closest_bridge']
+    >>> operation['calls'], operation['distance_evaluations']
+    (1, 2)
+    >>> from copy import deepcopy
+    >>> from bridge_store import BridgeStore
+    >>> from distance_service import build_distance_service
+    >>> bridges = BridgeStore(deepcopy(bridge_functions.THREE_BRIDGES))
+    >>> service = build_distance_service(bridges)
+    >>> with instrumented() as profile:
+    ...     bridge_functions.get_closest_bridge(bridges, 2)
+    1
+    >>> profile.operations['get_closest_bridge']['distance_evaluations']
+    2
+    >>> profile = reset()
+    """
+
+    global _PREVIOUS_TRACE
+    disable()
+    functions = _public_functions()
+    wrappers = {function: _instrument(name, function)
+                for (name, function) in functions.items()}
+    for (module_name, name) in DISTANCE_KERNELS:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            function = getattr(module, name)
+            wrappers[function] = _count_distances(function)
+    for module in list(sys.modules.values()):
+        for name, value in list(vars(module).items()):
+            if inspect.isfunction(value) and value in wrappers:
+                _ORIGINALS[(module.__name__, name)] = value
+                setattr(module, name, wrappers[value])
+    if count_scans:
+        _SCAN_LINES.update(_find_scan_lines())
+        _PREVIOUS_TRACE = sys.gettrace()
+        sys.settrace(_trace_calls)
+    return _PROFILE
+
+
+def disable() -> None:
+    """Stop instrumenting bridge_functions, restoring the original functions
+    and the trace function set before scan counting was enabled. The profile
+    recorded so far is kept.
+
+    >>> def tracer(frame, event, arg):
+    ...     return None
+    >>> previous = sys.gettrace()
+    >>> sys.settrace(tracer)
+    >>> profile = enable(count_scans=True)
+    >>> disable()
+    >>> sys.gettrace() is tracer
+    True
+    >>> sys.settrace(previous)
+    >>> profile = reset()
+    """
+
+    global _PREVIOUS_TRACE
+    if _SCAN_LINES:
+        if sys.gettrace() is _trace_calls:
+            sys.settrace(_PREVIOUS_TRACE)
+        _PREVIOUS_TRACE = None
+        _SCAN_LINES.clear()
+    for (module_name, name), function in _ORIGINALS.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            setattr(module, name, function)
+    _ORIGINALS.clear()
+
+
+def reset() -> Profile:
+    """Start a new, empty profile and return it."""
+
+    global _PROFILE
+    _PROFILE = Profile()
+    return _PROFILE
+
+
+def get_profile() -> Profile:
+    """Return the profile calls are currently recorded in."""
+
+    return _PROFILE
+
+
+@contextmanager
+def instrumented(count_scans: bool = False) -> Iterator[Profile]:
+    """Instrument bridge_functions, in a new profile, for the duration of a
+    with statement, counting scanned records too if count_scans is True.
+
+    >>> with instrumented(count_scans=True) as profile:
+    ...     bridge_functions.get_bridge(bridge_functions.THREE_BRIDGES, 3)[0]
+    3
+    >>> profile.operations['get_bridge']['records_scanned']
+    3
+    >>> is_enabled()
+    False
+    """
+
+    profile = reset()
+    enable(count_scans)
+    try:
+        yield profile
+    finally:
+        disable()
@@ -0,0 +1,175 @@
+"""Bridge records that are formatted field by field, when first used.
+
+format_data formats every field of every record when the data is loaded,
+even when a job only looks at locations or names. A LazyRecord wraps an
+uncleaned record and formats one group of fields (the location, the
+length, the spans or the BCIs) the first time a field of that group is
+read or written, using the format_* helper for that group, and then keeps
+the formatted values. A job that only finds bridges in a radius or by name
+never parses a span or a BCI.
+
+A LazyRecord is indexed with the *_INDEX constants and compares equal to
+the record format_data would produce, so it can be used wherever
+bridge_functions expects a formatted bridge record.
+"""
+
+from typing import Iterator
+
+from bridge_functions import (
+    format_location, format_length, format_spans, format_bcis)
+from bridge_store import BridgeStore
+from constants import (
+    ID_INDEX, LAT_INDEX, LON_INDEX, NUM_SPANS_INDEX, SPAN_DETAILS_INDEX,
+    LENGTH_INDEX, BCIS_INDEX)
+
+
+NUM_FIELDS = BCIS_INDEX + 1
+# Maps the index of each field that is formatted lazily to the helper that
+# formats its group.
+FORMATTERS = {LAT_INDEX: format_location, LON_INDEX: format_location,
+              LENGTH_INDEX: format_length, NUM_SPANS_INDEX: format_spans,
+              SPAN_DETAILS_INDEX: format_spans, BCIS_INDEX: format_bcis}
+# The helpers of all the groups, which a new record has yet to run.
+ALL_FORMATTERS = frozenset(FORMATTERS.values())
+
+
+class LazyRecord:
+    """A bridge record whose fields are formatted when they are first used.
+
+    >>> from bridge_functions import UNIQUE
+    >>> row = ['2 -  29/', 'MAPLE STREET OVERPASS', '402', '42.956781',
+    ...        '-81.346897', '1972', '2015', '2010', '3',
+    ...        'Total=48.5  (1)=15.5;(2)=18;(3)=15;', '49.5', '07/11/2015',
+    ...        '70.2', '', '70.2', '', '68.9', '', '69.3', '', '69.3', '',
+    ...        '70.1', '', '70.8', '71.4', '']
+    >>> record = LazyRecord(row, 1)
+    >>> record[ID_INDEX], record[LAT_INDEX]
+    (1, 42.956781)
+    >>> record.is_formatted(LON_INDEX), record.is_formatted(BCIS_INDEX)
+    (True, False)
+    >>> record == UNIQUE[0]
+    True
+    >>> record.is_formatted(BCIS_INDEX)
+    True
+    """
+
+    __slots__ = ('_row', '_pending')
+
+    def __init__(self, row: list, bridge_id: int) -> None:
+        """Initialize a record that formats the uncleaned bridge record row,
+        which it takes over, as needed, and give it the ID bridge_id.
+        """
+
+        row[ID_INDEX] = bridge_id
+        self._row = row
+        self._pending = ALL_FORMATTERS
+
+    def _format(self, field_index: int) -> None:
+        """Format the group of field field_index, unless it is formatted.
+        """
+
+        formatter = FORMATTERS.get(field_index)
+        if formatter in self._pending:
+            formatter(self._row)
+            self._pending = self._pending - {formatter}
+
+    def is_formatted(self, field_index: int) -> bool:
+        """Return whether field field_index has been formatted."""
+
+        return FORMATTERS.get(field_index) not in self._pending
+
+    def format_all(self) -> None:
+        """Format every field that has not been formatted yet."""
+
+        for field_index in FORMATTERS:
+            self._format(field_index)
+
+    def __getitem__(self, field_index):
+        """Return the value of field field_index, or a list of the values of
+        the fields in slice field_index.
+        """
+
+        if isinstance(field_index, slice):
+            return list(self)[field_index]
+        if field_index < 0:
+            field_index += NUM_FIELDS
+        if not 0 <= field_index < NUM_FIELDS:
+            raise IndexError('field index out of range')
+        self._format(field_index)
+        return self._row[field_index]
+
+    def __setitem__(self, field_index: int, value: object) -> None:
+        """Set field field_index to value, formatting the rest of its group
+        first.
+        """
+
+        if field_index < 0:
+            field_index += NUM_FIELDS
+        if not 0 <= field_index < NUM_FIELDS:
+            raise IndexError('field index out of range')
+        self._format(field_index)
+        self._row[field_index] = value
+
+    def __len__(self) -> int:
+        """Return the number of fields of a bridge."""
+
+        return NUM_FIELDS
+
+    def __iter__(self) -> Iterator[object]:
+        """Return an iterator over the values of the fields."""
+
+        return (self[field_index] for field_index in range(NUM_FIELDS))
+
+    def to_list(self) -> list:
+        """Return this bridge as a formatted bridge record, a list."""
+
+        self.format_all()
+        return self._row[:]
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether other is a LazyRecord or a list with the same
+        values.
+        """
+
+        if isinstance(other, LazyRecord):
+            other = other.to_list()
+        if not isinstance(other, list):
+            return NotImplemented
+        return self.to_list() == other
+
+    def __repr__(self) -> str:
+        """Return a representation of this bridge as a list."""
+
+        return f'LazyRecord({self.to_list()!r})'
+
+
+def format_data_lazily(data: list[list[str]]) -> None:
+    """Modify the uncleaned bridge data data so that each record is
+    replaced by a LazyRecord that formats it as format_data would, as its
+    fields are used, with IDs numbered from 1.
+
+    >>> from bridge_functions import UNIQUE, get_bridges_in_radius
+    >>> data = BridgeStore([
+    ...     ['1 -  32/', 'Highway 24 Underpass at Highway 403', '403',
+    ...      '43.167233', '-80.275567', '1965', '2014', '2009', '4',
+    ...      'Total=64  (1)=12;(2)=19;(3)=21;(4)=12;', '65', '04/13/2012',
+    ...      '72.3', '', '72.3', '', '69.5', '', '70', '', '70.3', '',
+    ...      '70.5', '', '70.7', '72.9', ''],
+    ...     ['2 -  29/', 'MAPLE STREET OVERPASS', '402', '42.956781',
+    ...      '-81.346897', '1972', '2015', '2010', '3',
+    ...      'Total=48.5  (1)=15.5;(2)=18;(3)=15;', '49.5', '07/11/2015',
+    ...      '70.2', '', '70.2', '', '68.9', '', '69.3', '', '69.3', '',
+    ...      '70.1', '', '70.8', '71.4', '']])
+    >>> format_data_lazily(data)
+    >>> get_bridges_in_radius(data, 43.10, -80.15, 50)
+    [1]
+    >>> [bridge.is_formatted(SPAN_DETAILS_INDEX) for bridge in data]
+    [False, False]
+    >>> data.get(2) == [2] + UNIQUE[0][1:]
+    True
+    """
+
+    for i in range(len(data)):
+        data[i] = LazyRecord(data[i], i + 1)
+    if isinstance(data, BridgeStore):
+        data.reindex()
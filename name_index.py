@@ -0,0 +1,97 @@
+"""An inverted trigram index over bridge names, for case-insensitive
+substring search without scanning every name.
+
+Each lowercased name is split into its overlapping three-character
+substrings (trigrams), and the index maps each trigram to the positions
+of the bridges whose names contain it. A search string of at least three
+characters can only occur in names that contain all of its trigrams, so
+only those names are checked.
+"""
+
+from constants import NAME_INDEX
+from index_registry import attach_index
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the set of three-character substrings of text.
+
+    >>> sorted(trigrams('river'))
+    ['ive', 'riv', 'ver']
+    >>> trigrams('ab')
+    set()
+    """
+
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """A trigram index over the names of the bridges in bridge data.
+
+    >>> index = NameIndex([[1, 'Highway 24 Underpass at Highway 403'],
+    ...                    [2, 'WEST STREET UNDERPASS'],
+    ...                    [3, 'STOKES RIVER BRIDGE']])
+    >>> index.positions_containing('underpass')
+    [0, 1]
+    >>> index.positions_containing('RIVER')
+    [2]
+    >>> index.positions_containing('st')
+    [1, 2]
+    >>> index.positions_containing('tunnel')
+    []
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize a new index over the names of the bridges in bridge
+        data bridge_data.
+        """
+
+        self.size = len(bridge_data)
+        self._names = [bridge[NAME_INDEX].lower() for bridge in bridge_data]
+        self._postings = {}
+        for pos in range(self.size):
+            for trigram in trigrams(self._names[pos]):
+                if trigram not in self._postings:
+                    self._postings[trigram] = []
+                self._postings[trigram].append(pos)
+
+    def record_changed(self, bridge: list) -> None:
+        """Do nothing: the functions that modify bridges in place do not
+        rename them, and an IncrementalLoader detaches this index when a
+        load does.
+        """
+
+    def positions_containing(self, search_string: str) -> list[int]:
+        """Return the positions of the bridges whose names contain
+        search_string, ignoring case, in increasing order.
+        """
+
+        search_string = search_string.lower()
+        search_trigrams = trigrams(search_string)
+        if not search_trigrams:
+            return [pos for pos in range(self.size)
+                    if search_string in self._names[pos]]
+
+        postings = sorted((self._postings.get(trigram, [])
+                           for trigram in search_trigrams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        return sorted(pos for pos in candidates
+                      if search_string in self._names[pos])
+
+
+def build_name_index(bridge_data: list[list]) -> NameIndex:
+    """Build a name index over the BridgeStore bridge_data, attach it to
+    bridge_data so that get_bridges_containing and
+    get_bridges_containing_each use it, and return it.
+
+    >>> from bridge_store import BridgeStore
+    >>> build_name_index(BridgeStore([[1, 'STOKES RIVER BRIDGE']])).size
+    1
+    """
+
+    index = NameIndex(bridge_data)
+    attach_index(bridge_data, index)
+    return index
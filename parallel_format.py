@@ -0,0 +1,71 @@
+"""Format uncleaned bridge data in several worker processes at once.
+
+format_data_parallel produces exactly the same result as format_data: the
+rows are split into chunks of consecutive rows, each chunk is formatted by
+format_record in a worker process with the IDs its rows would get from
+format_data, and the formatted rows are copied back into the original
+records in order.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from bridge_functions import format_data, format_record
+from bridge_store import BridgeStore
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def format_chunk(first_id: int, rows: list[list[str]]) -> list[list]:
+    """Return the uncleaned rows rows formatted, where the first row gets
+    ID first_id and each following row the next ID.
+
+    >>> rows = format_chunk(5, [['2 -  29/', 'MAPLE STREET OVERPASS',
+    ...     '402', '42.956781', '-81.346897', '1972', '2015', '2010', '3',
+    ...     'Total=48.5  (1)=15.5;(2)=18;(3)=15;', '49.5', '07/11/2015',
+    ...     '70.2', '', '70.2', '', '68.9', '', '69.3', '', '69.3', '',
+    ...     '70.1', '', '70.8', '71.4', '']])
+    >>> rows[0][:5]
+    [5, 'MAPLE STREET OVERPASS', '402', 42.956781, -81.346897]
+    """
+
+    for offset in range(len(rows)):
+        format_record(rows[offset], first_id + offset)
+    return rows
+
+
+def format_data_parallel(data: list[list[str]],
+                         workers: Optional[int] = None,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """Modify the uncleaned bridge data data exactly as format_data does,
+    formatting chunks of at most chunk_size rows in up to workers worker
+    processes (by default, one per CPU). Data that fits in a single chunk,
+    or a single worker, is formatted in this process.
+
+    >>> from copy import deepcopy
+    >>> from bridge_functions import THREE_BRIDGES_UNCLEANED, THREE_BRIDGES
+    >>> data = deepcopy(THREE_BRIDGES_UNCLEANED)
+    >>> format_data_parallel(data, workers=2, chunk_size=2)
+    >>> data == THREE_BRIDGES
+    True
+    """
+
+    chunk_size = max(chunk_size, 1)
+    if workers == 1 or len(data) <= chunk_size:
+        format_data(data)
+        return
+
+    starts = range(0, len(data), chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(format_chunk,
+                              [start + 1 for start in starts],
+                              [data[start:start + chunk_size]
+                               for start in starts])
+        for start, chunk in zip(starts, chunks):
+            for offset in range(len(chunk)):
+                # Keep the original record lists, as format_data does.
+                data[start + offset][:] = chunk[offset]
+
+    if isinstance(data, BridgeStore):
+        data.reindex()
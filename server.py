@@ -0,0 +1,294 @@
+"""A local query server for a bridge inventory.
+
+The server loads and formats the inventory once, and answers queries sent
+over TCP as line-delimited JSON: each request is one line holding an object
+{"id": ..., "op": ..., "args": {...}}, and each response is one line holding
+{"id": ..., "result": ...} or {"id": ..., "error": ...}.
+
+Queries are answered from the current snapshot of the inventory, which is
+never modified. A mutation copies the snapshot, sharing every record it
+does not change, applies inspect_bridges or add_rehab to the copy in a
+worker thread and then publishes the copy as the new snapshot, so queries
+keep being answered while it runs. Mutations are applied one at a time.
+
+Run, for example:
+
+    python server.py bridge_data.csv --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+from copy import deepcopy
+from typing import Any, Callable, Optional
+
+import bridge_functions as bf
+from bridge_store import BridgeStore
+from index_registry import attach_index, detach_indexes, find_index
+from name_index import NameIndex, build_name_index
+from spatial_index import SpatialIndex, build_spatial_index
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Maps each query op to the function answering it and its argument names.
+QUERIES = {
+    'get_bridge': (bf.get_bridge, ['bridge_id']),
+    'average_bci': (bf.get_average_bci, ['bridge_id']),
+    'total_length_on_hwy': (bf.get_total_length_on_hwy, ['highway']),
+    'closest_bridge': (bf.get_closest_bridge, ['bridge_id']),
+    'closest_bridges': (bf.get_closest_bridges, ['bridge_id', 'k']),
+    'bridges_in_radius': (bf.get_bridges_in_radius,
+                          ['lat', 'lon', 'distance']),
+    'bci_below': (bf.get_bridges_with_bci_below, ['bridge_ids', 'bci_limit']),
+    'search': (bf.get_bridges_containing, ['search_string']),
+}
+# Maps each mutation op to the function applying it and its argument names.
+MUTATIONS = {
+    'inspect': (bf.inspect_bridges, ['bridge_ids', 'date', 'bci']),
+    'rehab': (bf.add_rehab, ['bridge_id', 'date', 'is_major']),
+}
+# Maps the name of each mutation argument to the type its value must have.
+# The IDs in bridge_ids must be ints.
+ARGUMENT_TYPES = {'bridge_id': int, 'bridge_ids': list, 'date': str,
+                  'bci': (int, float), 'is_major': bool}
+# The indexes shared between snapshots: inspect_bridges and add_rehab never
+# change the locations or names they describe.
+SHARED_INDEXES = (SpatialIndex, NameIndex)
+
+
+class Inventory:
+    """The current snapshot of a bridge inventory and its version number.
+
+    >>> inventory = Inventory(deepcopy(bf.THREE_BRIDGES))
+    >>> inventory.query('search', {'search_string': 'river'})
+    [3]
+    >>> asyncio.run(inventory.mutate(
+    ...     'inspect', {'bridge_ids': [3], 'date': '10/18/2026', 'bci': 60.0}))
+    1
+    >>> inventory.query('bci_below', {'bridge_ids': [1, 2, 3],
+    ...                               'bci_limit': 65})
+    [3]
+    """
+
+    def __init__(self, bridge_data: list[list]) -> None:
+        """Initialize the inventory with the formatted bridge data
+        bridge_data, building the indexes its queries use.
+        """
+
+        self.snapshot = BridgeStore(bridge_data)
+        self.snapshot.reindex()
+        build_spatial_index(self.snapshot)
+        build_name_index(self.snapshot)
+        self.version = 0
+        self._write_lock = asyncio.Lock()
+
+    def query(self, op: str, args: dict) -> Any:
+        """Return the answer to query op with arguments args from the
+        current snapshot.
+        """
+
+        function, names = QUERIES[op]
+        return function(self.snapshot, *[args[name] for name in names])
+
+    async def mutate(self, op: str, args: dict) -> int:
+        """Apply mutation op with arguments args, publish the result as the
+        new snapshot, and return its version number.
+        """
+
+        function, names = MUTATIONS[op]
+        values = [args[name] for name in names]
+        _check_arguments(names, values)
+        async with self._write_lock:
+            snapshot = await asyncio.get_running_loop().run_in_executor(
+                None, _apply, self.snapshot, function, values)
+            detach_indexes(self.snapshot)
+            self.snapshot = snapshot
+            self.version += 1
+            return self.version
+
+
+def _is_instance(value: Any, expected: Any) -> bool:
+    """Return whether value is an instance of the type or types expected.
+    A bool is not taken to be a number.
+    """
+
+    return (isinstance(value, expected)
+            and (expected is bool or not isinstance(value, bool)))
+
+
+def _check_arguments(names: list[str], values: list) -> None:
+    """Raise TypeError unless each of values has the type ARGUMENT_TYPES
+    gives the argument with the corresponding name in names.
+
+    >>> _check_arguments(['bridge_ids', 'bci'], [[1, 2], 70])
+    >>> _check_arguments(['bridge_ids', 'bci'], [[1, '2'], 70])
+    Traceback (most recent call last):
+    TypeError: bridge_ids must be a list of int
+    >>> _check_arguments(['bridge_id', 'is_major'], [3, 'no'])
+    Traceback (most recent call last):
+    TypeError: is_major must be a bool, not str
+    """
+
+    for name, value in zip(names, values):
+        expected = ARGUMENT_TYPES[name]
+        if not _is_instance(value, expected):
+            type_name = getattr(expected, '__name__', 'number')
+            raise TypeError(f'{name} must be a {type_name}, not '
+                            f'{type(value).__name__}')
+        if name == 'bridge_ids' and not all(_is_instance(bridge_id, int)
+                                            for bridge_id in value):
+            raise TypeError(f'{name} must be a list of int')
+
+
+def _apply(snapshot: BridgeStore, function: Callable,
+           values: list) -> BridgeStore:
+    """Return a copy of snapshot with function(copy, *values) applied to
+    it, copying only the records the function may change.
+
+    The shared indexes of snapshot are attached to the copy only once the
+    function has succeeded, so a failed mutation never reaches them.
+
+    >>> snapshot = BridgeStore(deepcopy(bf.THREE_BRIDGES))
+    >>> index = build_spatial_index(snapshot)
+    >>> def fail(bridge_data, bridge_id):
+    ...     raise ValueError('no')
+    >>> _apply(snapshot, fail, [1])
+    Traceback (most recent call last):
+    ValueError: no
+    >>> find_index(snapshot, SpatialIndex) is index
+    True
+    """
+
+    bridge_ids = values[0] if isinstance(values[0], list) else [values[0]]
+    copied = snapshot.copy()
+    for bridge_id in bridge_ids:
+        pos = copied.position(bridge_id)
+        if pos != -1:
+            copied.replace(pos, deepcopy(snapshot[pos]))
+    function(copied, *values)
+    for index_type in SHARED_INDEXES:
+        index = find_index(snapshot, index_type)
+        if index is not None:
+            attach_index(copied, index)
+    return copied
+
+
+async def handle_request(inventory: Inventory, line: bytes) -> dict:
+    """Return the response to the request in line.
+
+    >>> inventory = Inventory(deepcopy(bf.THREE_BRIDGES))
+    >>> asyncio.run(handle_request(inventory,
+    ...     b'{"id": 7, "op": "closest_bridge", "args": {"bridge_id": 2}}'))
+    {'id': 7, 'result': 1}
+    >>> asyncio.run(handle_request(inventory, b'{"id": 8, "op": "nap"}'))
+    {'id': 8, 'error': "unknown op 'nap'"}
+    """
+
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        op, args = request.get('op'), request.get('args', {})
+        if op in QUERIES:
+            result = inventory.query(op, args)
+        elif op in MUTATIONS:
+            result = {'version': await inventory.mutate(op, args)}
+        elif op == 'version':
+            result = inventory.version
+        else:
+            return {'id': request_id, 'error': f'unknown op {op!r}'}
+    except (ValueError, KeyError, IndexError, TypeError,
+            AttributeError) as error:
+        return {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+    return {'id': request_id, 'result': result}
+
+
+def _encode(response: dict) -> bytes:
+    """Return response as a line of JSON. BCI histories are written as
+    lists, newest first.
+    """
+
+    return json.dumps(response, default=list).encode('utf-8') + b'\n'
+
+
+async def serve_client(inventory: Inventory, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> None:
+    """Answer the requests sent by one client until it disconnects."""
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                writer.write(_encode(await handle_request(inventory, line)))
+                await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(inventory: Inventory, host: str = DEFAULT_HOST,
+                       port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+    """Start serving inventory on host and port, and return the server.
+
+    >>> async def ask(request: bytes) -> bytes:
+    ...     server = await start_server(Inventory(deepcopy(bf.THREE_BRIDGES)),
+    ...                                 port=0)
+    ...     port = server.sockets[0].getsockname()[1]
+    ...     reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+    ...     writer.write(request)
+    ...     response = await reader.readline()
+    ...     writer.close()
+    ...     await writer.wait_closed()
+    ...     await asyncio.sleep(0.01)
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return response
+    >>> asyncio.run(ask(b'{"id": 1, "op": "search", "args": '
+    ...                 b'{"search_string": "underpass"}}\\n'))
+    b'{"id": 1, "result": [1, 2]}\\n'
+    """
+
+    return await asyncio.start_server(
+        lambda reader, writer: serve_client(inventory, reader, writer),
+        host, port)
+
+
+def load_inventory(csv_path: str) -> Inventory:
+    """Return an inventory of the bridges in the CSV file at csv_path."""
+
+    with open(csv_path, encoding='utf-8') as csv_file:
+        bridge_data = bf.read_data(csv_file)
+    bf.format_data(bridge_data)
+    return Inventory(bridge_data)
+
+
+async def _serve_forever(inventory: Inventory, host: str, port: int) -> None:
+    """Serve inventory on host and port until cancelled."""
+
+    server = await start_server(inventory, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Load the inventory named on the command line and serve it."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('csv_path', help='the raw bridge data CSV file')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(load_inventory(args.csv_path),
+                                   args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Binary snapshots of formatted bridge data, for fast startup.
+
+A snapshot holds the columns of a BridgeColumns together with the size,
+modification time and SHA-256 hash of the CSV file the data was read from.
+Loading a snapshot maps the file into memory and uses the numeric columns
+in place, without parsing or copying them, so a warm start costs little
+more than reading the text columns. A snapshot whose CSV file has changed
+since it was saved is never loaded.
+
+Layout of a snapshot file: SNAPSHOT_MAGIC, then the length of a JSON header
+as an 8-byte little-endian integer, then the header, then the numeric
+columns, each starting at a multiple of 8 bytes.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+from typing import Optional
+
+from bridge_functions import read_data, format_data
+from columnar import BridgeColumns, to_columns
+from constants import BCIS_INDEX
+
+
+SNAPSHOT_MAGIC = b'BRIDGESNAP1\n'
+NUMERIC_COLUMNS = ('ids', 'lats', 'lons', 'num_spans', 'span_offsets',
+                   'spans', 'lengths', 'bci_offsets', 'bcis')
+TEXT_COLUMNS = ('names', 'highways', 'years', 'last_majors', 'last_minors',
+                'last_inspected')
+
+
+def source_key(csv_path: str, with_hash: bool = True) -> dict:
+    """Return a dictionary with the size, modification time and, if
+    with_hash is True, SHA-256 hash of the file at csv_path.
+    """
+
+    stat = os.stat(csv_path)
+    key = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as csv_file:
+            for block in iter(lambda: csv_file.read(1 << 20), b''):
+                digest.update(block)
+        key['sha256'] = digest.hexdigest()
+    return key
+
+
+def save_snapshot(bridge_data: list[list], csv_path: str,
+                  snapshot_path: str, source: Optional[dict] = None) -> None:
+    """Save the formatted bridge data bridge_data, read from the CSV file
+    at csv_path, as a snapshot at snapshot_path. bridge_data may be a list
+    of records or a BridgeColumns.
+
+    source is the source key of the CSV file taken before bridge_data was
+    read from it; if it is None, the key is taken now. A key taken before
+    reading never describes a newer file than the data came from, so a file
+    changed while it was read is not mistaken for the saved one.
+    """
+
+    if not isinstance(bridge_data, BridgeColumns):
+        bridge_data = to_columns(bridge_data)
+    if source is None:
+        source = source_key(csv_path)
+
+    header = {'source': source, 'byteorder': sys.byteorder,
+              'count': len(bridge_data), 'columns': {},
+              'text': {name: list(getattr(bridge_data, name))
+                       for name in TEXT_COLUMNS}}
+    blobs = []
+    offset = 0
+    for name in NUMERIC_COLUMNS:
+        column = memoryview(getattr(bridge_data, name))
+        blobs.append(column.tobytes())
+        header['columns'][name] = {'offset': offset,
+                                   'length': column.nbytes,
+                                   'format': column.format}
+        offset += -(-column.nbytes // 8) * 8
+
+    encoded = json.dumps(header).encode('utf-8')
+    temp_path = snapshot_path + '.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(len(encoded).to_bytes(8, 'little'))
+        snapshot_file.write(encoded)
+        snapshot_file.write(bytes(-snapshot_file.tell() % 8))
+        for blob in blobs:
+            snapshot_file.write(blob)
+            snapshot_file.write(bytes(-len(blob) % 8))
+    os.replace(temp_path, snapshot_path)
+
+
+def _read_header(snapshot_file) -> Optional[dict]:
+    """Return the header of the open snapshot file snapshot_file, leaving
+    the file positioned at the start of the header, or None if
+    snapshot_file is not a snapshot.
+    """
+
+    if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+        return None
+    length = int.from_bytes(snapshot_file.read(8), 'little')
+    return json.loads(snapshot_file.read(length).decode('utf-8'))
+
+
+def _is_fresh(saved: dict, csv_path: str) -> bool:
+    """Return whether the CSV file at csv_path is the one described by the
+    source key saved. The file is only hashed when its size is unchanged
+    but its modification time is not.
+    """
+
+    try:
+        current = source_key(csv_path, with_hash=False)
+    except OSError:
+        return False
+    if current['size'] != saved['size']:
+        return False
+    if current['mtime_ns'] == saved['mtime_ns']:
+        return True
+    return source_key(csv_path)['sha256'] == saved['sha256']
+
+
+def load_snapshot(csv_path: str,
+                  snapshot_path: str) -> Optional[BridgeColumns]:
+    r"""Return the bridge data saved in the snapshot at snapshot_path, or
+    None if there is no such snapshot or the CSV file at csv_path has
+    changed since it was saved.
+
+    The numeric columns of the result are read-only memoryviews of the
+    snapshot file mapped into memory.
+
+    >>> import os, tempfile
+    >>> folder = tempfile.TemporaryDirectory()
+    >>> csv_path = os.path.join(folder.name, 'bridges.csv')
+    >>> snapshot_path = os.path.join(folder.name, 'bridges.snapshot')
+    >>> with open(csv_path, 'w', encoding='utf-8') as csv_file:
+    ...     _ = csv_file.write('\n\n1 -  32/,A,403,43.1,-80.2,1965,2014,'
+    ...                        '2009,1,Total=64  (1)=64;,65,04/13/2012,'
+    ...                        '72.3,,72.3,,69.5,,,,,,,,,,\n')
+    >>> load_snapshot(csv_path, snapshot_path) is None
+    True
+    >>> columns = load_bridges(csv_path, snapshot_path)
+    >>> columns = load_snapshot(csv_path, snapshot_path)
+    >>> columns[0][BCIS_INDEX], list(columns.lats)
+    ([72.3, 69.5], [43.1])
+    >>> with open(csv_path, 'a', encoding='utf-8') as csv_file:
+    ...     _ = csv_file.write('\n')
+    >>> load_snapshot(csv_path, snapshot_path) is None
+    True
+    >>> folder.cleanup()
+    """
+
+    try:
+        snapshot_file = open(snapshot_path, 'rb')
+    except OSError:
+        return None
+    with snapshot_file:
+        header = _read_header(snapshot_file)
+        if (header is None or header['byteorder'] != sys.byteorder
+                or not _is_fresh(header['source'], csv_path)):
+            return None
+        data_start = -(-snapshot_file.tell() // 8) * 8
+        mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    columns = BridgeColumns()
+    view = memoryview(mapped)
+    for name, column in header['columns'].items():
+        start = data_start + column['offset']
+        setattr(columns, name,
+                view[start:start + column['length']].cast(column['format']))
+    for name, values in header['text'].items():
+        setattr(columns, name, values)
+    return columns
+
+
+def load_bridges(csv_path: str, snapshot_path: str) -> BridgeColumns:
+    """Return the formatted bridge data from the CSV file at csv_path, from
+    the snapshot at snapshot_path if it is up to date. Otherwise read and
+    format the CSV file, save a new snapshot, and return the data.
+    """
+
+    columns = load_snapshot(csv_path, snapshot_path)
+    if columns is None:
+        source = source_key(csv_path)
+        with open(csv_path, encoding='utf-8') as csv_file:
+            bridge_data = read_data(csv_file)
+        format_data(bridge_data)
+        save_snapshot(bridge_data, csv_path, snapshot_path, source)
+        columns = load_snapshot(csv_path, snapshot_path)
+        if columns is None:
+            columns = to_columns(bridge_data)
+    return columns
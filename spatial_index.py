@@ -0,0 +1,275 @@
+"""A KD-tree over the locations of bridges, used to answer radius and
+nearest-neighbour queries without computing the distance to every bridge.
+
+Locations are stored as points on the unit sphere, so the straight-line
+(chord) distance between two points grows with the distance between the
+two locations on the surface of the Earth, and no special care is needed
+near the poles or the antimeridian.
+"""
+
+from heapq import heappush, heapreplace
+from math import sin, cos, asin, radians, sqrt, pi
+from typing import Callable, Optional
+
+from constants import LAT_INDEX, LON_INDEX, EARTH_RADIUS
+from index_registry import attach_index
+
+
+# calculate_distance rounds to the nearest meter, so a bridge reported to
+# be within some radius may really be up to half a meter outside of it.
+# Searches are widened by SEARCH_MARGIN kilometers so no such bridge is
+# missed; the caller checks every candidate with calculate_distance.
+SEARCH_MARGIN = 0.001
+LEAF_SIZE = 16
+
+
+def to_unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    """Return the point on the unit sphere at latitude lat and longitude
+    lon, given in degrees.
+
+    >>> to_unit_vector(0.0, 0.0)
+    (1.0, 0.0, 0.0)
+    >>> [round(coord, 6) for coord in to_unit_vector(90.0, 0.0)]
+    [0.0, 0.0, 1.0]
+    """
+
+    lat, lon = radians(lat), radians(lon)
+    return (cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat))
+
+
+def chord_length(distance: float) -> float:
+    """Return the straight-line distance between two points on the unit
+    sphere whose locations are distance kilometers apart on the surface of
+    the Earth.
+
+    >>> chord_length(0.0)
+    0.0
+    >>> round(chord_length(pi * EARTH_RADIUS), 6)
+    2.0
+    """
+
+    angle = min(max(distance, 0.0) / EARTH_RADIUS, pi)
+    return 2 * sin(angle / 2)
+
+
+def chord_distance(chord: float) -> float:
+    """Return the distance in kilometers on the surface of the Earth between
+    two locations whose points on the unit sphere are chord apart. This is
+    the inverse of chord_length.
+
+    >>> round(chord_distance(chord_length(224.451)), 6)
+    224.451
+    """
+
+    return 2 * EARTH_RADIUS * asin(min(chord / 2, 1.0))
+
+
+class SpatialIndex:
+    """A KD-tree over the locations of the bridges in bridge data.
+
+    Queries answer with positions of bridges in the bridge data the index
+    was built from, in increasing order.
+
+    >>> index = SpatialIndex([[1, 'A', '1', 43.167233, -80.275567],
+    ...                       [2, 'B', '1', 43.164531, -80.251582],
+    ...                       [3, 'C', '6', 45.036739, -81.33579]])
+    >>> index.candidates_in_radius(43.16, -80.26, 5)
+    [0, 1]
+    >>> index.candidates_in_radius(43.7, -79.4, 300)
+    [0, 1, 2]
+    >>> [pos for (chord, pos) in index.nearest(43.16, -80.25, 2)]
+    [1, 0]
+    >>> index.nearest_candidates(43.16, -80.25, 1, lambda pos: pos == 1)
+    [0]
+    """
+
+    def __init__(self, bridge_data: list[list],
+                 leaf_size: int = LEAF_SIZE) -> None:
+        """Initialize a new index over the locations of the bridges in
+        bridge data bridge_data, with at most leaf_size bridges per leaf.
+        """
+
+        self._index_points([to_unit_vector(bridge[LAT_INDEX],
+                                           bridge[LON_INDEX])
+                            for bridge in bridge_data], leaf_size)
+
+    @classmethod
+    def from_locations(cls, locations: list[list[float]],
+                       leaf_size: int = LEAF_SIZE) -> 'SpatialIndex':
+        """Return a new index over locations, a list of [latitude,
+        longitude] pairs such as the inspectors given to assign_inspectors.
+        Queries answer with positions in locations.
+
+        >>> index = SpatialIndex.from_locations([[43.10, -80.15],
+        ...                                      [45.0368, -81.34]])
+        >>> index.candidates_in_radius(45.036739, -81.33579, 10)
+        [1]
+        """
+
+        index = cls.__new__(cls)
+        index._index_points([to_unit_vector(location[0], location[1])
+                             for location in locations], leaf_size)
+        return index
+
+    def _index_points(self, points: list[tuple[float, float, float]],
+                      leaf_size: int) -> None:
+        """Build the tree over points, with at most leaf_size points per
+        leaf.
+        """
+
+        self.size = len(points)
+        self._points = points
+        self._leaf_size = max(leaf_size, 1)
+        self._root = self._build(list(range(self.size)))
+
+    def record_changed(self, bridge: list) -> None:
+        """Do nothing: the functions that modify bridges in place do not
+        move them, and an IncrementalLoader detaches this index when a
+        load does.
+        """
+
+    def _build(self, positions: list[int]) -> object:
+        """Return a subtree over the points at positions positions.
+
+        A leaf is a list of positions. Any other node is a tuple (axis,
+        split, left, right), where every point in subtree left has
+        coordinate axis at most split, and every point in subtree right has
+        coordinate axis at least split.
+        """
+
+        if len(positions) <= self._leaf_size:
+            return positions
+
+        points = self._points
+        spreads = [max(points[pos][axis] for pos in positions)
+                   - min(points[pos][axis] for pos in positions)
+                   for axis in range(3)]
+        axis = spreads.index(max(spreads))
+        positions.sort(key=lambda pos: points[pos][axis])
+        middle = len(positions) // 2
+        return (axis, points[positions[middle]][axis],
+                self._build(positions[:middle]),
+                self._build(positions[middle:]))
+
+    def within(self, point: tuple[float, float, float],
+               chord: float) -> list[int]:
+        """Return the positions of the bridges whose points are at most
+        chord away from point on the unit sphere.
+        """
+
+        found = []
+        limit = chord * chord
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                for pos in node:
+                    other = self._points[pos]
+                    if ((point[0] - other[0]) ** 2 + (point[1] - other[1]) ** 2
+                            + (point[2] - other[2]) ** 2) <= limit:
+                        found.append(pos)
+            else:
+                axis, split, left, right = node
+                diff = point[axis] - split
+                if diff <= chord:
+                    stack.append(left)
+                if diff >= -chord:
+                    stack.append(right)
+        found.sort()
+        return found
+
+    def candidates_in_radius(self, lat: float, lon: float,
+                             radius: float) -> list[int]:
+        """Return the positions of all bridges that calculate_distance could
+        place within radius kilometers of the location (lat, lon). Some of
+        the bridges returned may turn out to be slightly farther away.
+        """
+
+        if radius < 0:
+            return []
+        if radius + SEARCH_MARGIN >= pi * EARTH_RADIUS:
+            return list(range(self.size))
+        return self.within(to_unit_vector(lat, lon),
+                           chord_length(radius + SEARCH_MARGIN))
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                skip: Optional[Callable[[int], bool]] = None
+                ) -> list[tuple[float, int]]:
+        """Return a list of (chord, position) pairs for the k bridges whose
+        points are closest to the point of location (lat, lon), nearest
+        first, where chord is the straight-line distance between the two
+        points on the unit sphere. Equally close bridges are ordered by
+        position. Positions for which skip returns True are ignored.
+        """
+
+        heap = []
+        if k > 0:
+            self._search(self._root, to_unit_vector(lat, lon), k, skip, heap)
+        return sorted((sqrt(-neg_square), -neg_pos)
+                      for (neg_square, neg_pos) in heap)
+
+    def _search(self, node: object, point: tuple[float, float, float],
+                k: int, skip: Optional[Callable[[int], bool]],
+                heap: list[tuple[float, int]]) -> None:
+        """Add the bridges in subtree node that are among the k closest
+        to point found so far to heap, a max-heap of (-square, -position)
+        pairs where square is the squared chord to point.
+        """
+
+        if isinstance(node, list):
+            for pos in node:
+                if skip is not None and skip(pos):
+                    continue
+                other = self._points[pos]
+                square = ((point[0] - other[0]) ** 2
+                          + (point[1] - other[1]) ** 2
+                          + (point[2] - other[2]) ** 2)
+                if len(heap) < k:
+                    heappush(heap, (-square, -pos))
+                elif (square, pos) < (-heap[0][0], -heap[0][1]):
+                    heapreplace(heap, (-square, -pos))
+            return
+
+        axis, split, left, right = node
+        diff = point[axis] - split
+        near, far = (left, right) if diff < 0 else (right, left)
+        self._search(near, point, k, skip, heap)
+        if len(heap) < k or diff * diff <= -heap[0][0]:
+            self._search(far, point, k, skip, heap)
+
+    def nearest_candidates(self, lat: float, lon: float, k: int = 1,
+                           skip: Optional[Callable[[int], bool]] = None
+                           ) -> list[int]:
+        """Return the positions of all bridges that calculate_distance could
+        place among the k closest to the location (lat, lon), ignoring the
+        positions for which skip returns True. Since calculate_distance
+        rounds to the nearest meter, more than k positions may be returned.
+        """
+
+        nearest = self.nearest(lat, lon, k, skip)
+        if len(nearest) < k:
+            return sorted(pos for (_, pos) in nearest)
+        farthest = chord_distance(nearest[-1][0])
+        return [pos for pos in self.candidates_in_radius(lat, lon, farthest)
+                if skip is None or not skip(pos)]
+
+
+def build_spatial_index(bridge_data: list[list],
+                        leaf_size: int = LEAF_SIZE) -> SpatialIndex:
+    """Build a spatial index over the BridgeStore bridge_data, attach it to
+    bridge_data so that get_bridges_in_radius, get_closest_bridge and
+    get_closest_bridges use it, and return it.
+
+    The index describes the locations of the bridges at the time it is
+    built. Rebuild it after moving a bridge; it is ignored automatically
+    once records are added, removed, replaced or reordered.
+
+    >>> from bridge_store import BridgeStore
+    >>> bridges = BridgeStore([[1, 'A', '1', 43.0, -80.0]])
+    >>> build_spatial_index(bridges).size
+    1
+    """
+
+    index = SpatialIndex(bridge_data, leaf_size)
+    attach_index(bridge_data, index)
+    return index